@@ -0,0 +1,44 @@
+"""Compare the memory and time of the old list based windowing with the strided views.
+
+Run from the repository root:
+    python benchmarks/windowing_memory.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from windowing import sliding_windows  # noqa: E402
+
+
+def list_windows(data, steps):
+    """The windowing model.preproccess used before"""
+    X_train = []
+    for i in range(steps, len(data)):
+        X_train.append(data[i-steps:i, :])
+    X_train = np.array(X_train)
+    return np.reshape(X_train, (X_train.shape[0], X_train.shape[1], X_train.shape[2]))
+
+
+def measure(fn, data, steps):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(data, steps)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+if __name__ == '__main__':
+    # 800 days x 10 tickers x 6 columns, like the app with every ticker selected
+    data = np.random.rand(800, 10 * 6)
+    for steps in (15, 30, 100):
+        old, old_time, old_peak = measure(list_windows, data, steps)
+        new, new_time, new_peak = measure(sliding_windows, data, steps)
+        assert np.array_equal(old, new)
+        print(f"steps={steps:3d}  list: {old_peak / 2**20:7.2f} MiB {old_time * 1000:7.2f} ms"
+              f"  strided: {new_peak / 2**20:7.2f} MiB {new_time * 1000:7.2f} ms")
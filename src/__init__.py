@@ -1,4 +1,22 @@
 from . import yfinanceScraper
 from . import inspo 
 from . import ticker_manager
-from . import model
\ No newline at end of file
+from . import model
+from . import bar_store
+from . import fetch_engine
+from . import signals
+from . import backtest
+from . import sweep
+from . import streaming
+from . import windowing
+from . import model_registry
+from . import retrain
+from . import inference_service
+from . import forecast
+from . import feature_pipeline
+from . import panel
+from . import bars
+from . import shared_store
+from . import case_model
+from . import sir_model
+from . import reproduction
@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+
+import signals
+
+TRADING_DAYS = 252
+# The statistics metrics() returns, in order
+METRICS = ("total_return", "annual_return", "sharpe", "max_drawdown", "hit_rate", "trades", "turnover", "exposure")
+
+
+def by_date(data):
+    """Index a Scraper style history frame by its (naive) trading date"""
+    if "datetime" in data.columns:
+        data = data.set_index("datetime")
+    index = pd.DatetimeIndex(data.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return data.set_axis(index.normalize(), axis=0)
+
+
+def align(vix, instrument):
+    """Return the VIX and instrument histories on their common trading dates"""
+    vix, instrument = by_date(vix), by_date(instrument)
+    dates = vix.index.intersection(instrument.index)
+    return vix.loc[dates], instrument.loc[dates]
+
+
+def check_holding_period(holding_period):
+    """Raise ValueError unless holding_period is a whole number of at least one bar"""
+    if int(holding_period) != holding_period or holding_period < 1:
+        raise ValueError(f"holding_period must be a whole number of bars >= 1, got {holding_period!r}")
+
+
+def active(signal, holding_period):
+    """True on the bars where a signal of the previous holding_period bars is still held.
+
+    A signal on the close of bar t is held from bar t+1 until bar t+holding_period.
+    Works along axis 0 of 1D or 2D arrays, with a running count instead of a loop.
+    """
+    count = np.cumsum(np.asarray(signal, dtype=np.int64), axis=0)
+    lagged = np.zeros_like(count)
+    lagged[holding_period:] = count[:-holding_period]
+    held = np.zeros(count.shape, dtype=bool)
+    held[1:] = (count - lagged)[:-1] > 0
+    return held
+
+
+def positions(buy, sell, holding_period, allow_short=False):
+    """Return the position on every bar: +1 after a buy, -1 after a sell when shorting is allowed"""
+    position = active(buy, holding_period).astype(np.float64)
+    if allow_short:
+        position -= active(sell, holding_period)
+    return position
+
+
+def simple_returns(close):
+    """Close to close returns along axis 0, the first bar has no return"""
+    close = np.asarray(close, dtype=np.float64)
+    returns = np.zeros_like(close)
+    returns[1:] = close[1:] / close[:-1] - 1
+    return np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def forward_returns(close, holding_period):
+    """Return from the close of every bar to the close holding_period bars later (nan at the end)"""
+    close = np.asarray(close, dtype=np.float64)
+    forward = np.full_like(close, np.nan)
+    forward[:-holding_period] = close[holding_period:] / close[:-holding_period] - 1
+    return forward
+
+
+def metrics(strategy_returns, position, buy, sell, forward, allow_short=False, listed=None):
+    """Summary statistics along axis 0, one value per column for 2D inputs.
+
+    listed (array): Bars on which each column has a price. Averages and yearly rates are taken
+    over these bars only, so tickers with a shorter history compare with the others.
+    """
+    if listed is None:
+        listed = np.ones(strategy_returns.shape, dtype=bool)
+    listed = np.broadcast_to(listed, strategy_returns.shape)
+    n_bars = listed.sum(axis=0)
+    years = n_bars / TRADING_DAYS
+
+    equity = np.cumprod(1 + strategy_returns, axis=0)
+    drawdown = equity / np.maximum.accumulate(equity, axis=0) - 1
+    total_return = equity[-1] - 1
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = strategy_returns.sum(axis=0) / n_bars
+        std = np.sqrt(np.where(listed, (strategy_returns - mean) ** 2, 0.0).sum(axis=0) / n_bars)
+        sharpe = np.where(std > 0, mean / std * np.sqrt(TRADING_DAYS), np.nan)
+
+    # A trigger is a hit when the instrument moved its way over the holding period
+    hits = np.where(buy, forward > 0, False)
+    trades = np.asarray(buy, dtype=np.int64)
+    if allow_short:
+        hits = hits | np.where(sell, forward < 0, False)
+        trades = trades + np.asarray(sell, dtype=np.int64)
+    # Triggers at the end of the history have no complete holding period yet
+    counted = np.isfinite(forward)
+    n_trades = (trades * counted).sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hit_rate = np.where(n_trades > 0, (hits & counted).sum(axis=0) / n_trades, np.nan)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        turnover = np.abs(np.diff(position, axis=0, prepend=0)).sum(axis=0) / years
+        exposure = np.abs(position).sum(axis=0) / n_bars
+        annual_return = np.where(total_return > -1, np.power(1 + total_return, 1 / years) - 1, -1.0)
+
+    return {
+        "total_return": total_return,
+        "annual_return": annual_return,
+        "sharpe": sharpe,
+        "max_drawdown": drawdown.min(axis=0),
+        "hit_rate": hit_rate,
+        "trades": n_trades,
+        "turnover": turnover,
+        "exposure": exposure,
+    }
+
+
+def simulate(buy, sell, close, holding_period, allow_short=False, cost=0.0):
+    """Simulate holding the instrument after every trigger.
+
+    Parameters:
+    buy, sell (array): Boolean triggers, shape (bars,) or (bars, 1) to broadcast over instruments
+    close (array): Closing prices of the traded instrument(s), shape (bars,) or (bars, instruments),
+        nan before an instrument was listed
+    holding_period (int): Number of bars a position is held after a trigger
+    allow_short (bool): Go short after a sell trigger instead of staying flat
+    cost (float): Cost as a fraction of the traded value for every unit of position change
+
+    Returns (strategy returns, metrics dict)
+    """
+    check_holding_period(holding_period)
+    close = np.asarray(close, dtype=np.float64)
+    # No trade on a trigger without a price, e.g. before the instrument was listed
+    listed = np.isfinite(close)
+    buy, sell = np.asarray(buy, dtype=bool) & listed, np.asarray(sell, dtype=bool) & listed
+    position = positions(buy, sell, holding_period, allow_short)
+    returns = simple_returns(close)
+    strategy_returns = position * returns
+    if cost:
+        strategy_returns = strategy_returns - cost * np.abs(np.diff(position, axis=0, prepend=0))
+    forward = forward_returns(close, holding_period)
+    return strategy_returns, metrics(strategy_returns, position, buy, sell, forward, allow_short, listed)
+
+
+def backtest(vix, instrument, lookback=signals.LOOKBACK, holding_period=5, threshold=0.0,
+             allow_short=False, cost=0.0):
+    """Backtest the VIX trigger on a traded instrument.
+
+    Parameters:
+    vix (DataFrame): VIX history (open, high, low, close), e.g. from Scraper.historic_data
+    instrument (DataFrame): History of the traded instrument, e.g. Ticker.SP500
+
+    Returns (DataFrame of daily position and returns, dict of metrics)
+    """
+    check_holding_period(holding_period)
+    vix, instrument = align(vix, instrument)
+    trigger = signals.cvr_trigger(vix["open"], vix["high"], vix["low"], vix["close"],
+                                  lookback=lookback, threshold=threshold)
+    buy, sell = trigger["buy"].to_numpy(), trigger["sell"].to_numpy()
+    close = instrument["close"].to_numpy(dtype=np.float64)
+
+    strategy_returns, stats = simulate(buy, sell, close, holding_period, allow_short, cost)
+    daily = pd.DataFrame({
+        "buy": buy,
+        "sell": sell,
+        "position": positions(buy, sell, holding_period, allow_short),
+        "returns": simple_returns(close),
+        "strategy_returns": strategy_returns,
+    }, index=vix.index)
+    daily["equity"] = (1 + daily["strategy_returns"]).cumprod()
+    return daily, {key: float(value) for key, value in stats.items()}
+
+
+def run_grid(vix, instrument, lookbacks=range(5, 61, 5), holding_periods=(1, 3, 5, 10, 20),
+             threshold=0.0, allow_short=False, cost=0.0):
+    """Backtest every (lookback, holding period) combination.
+
+    The signals are computed once per lookback and the prices are aligned once,
+    the result is a DataFrame with one row per combination.
+    """
+    for holding_period in holding_periods:
+        check_holding_period(holding_period)
+    vix, instrument = align(vix, instrument)
+    close = instrument["close"].to_numpy(dtype=np.float64)
+
+    rows = []
+    for lookback in lookbacks:
+        trigger = signals.cvr_trigger(vix["open"], vix["high"], vix["low"], vix["close"],
+                                      lookback=lookback, threshold=threshold)
+        buy, sell = trigger["buy"].to_numpy(), trigger["sell"].to_numpy()
+        for holding_period in holding_periods:
+            _, stats = simulate(buy, sell, close, holding_period, allow_short, cost)
+            rows.append({"lookback": lookback, "holding_period": holding_period,
+                         **{key: float(value) for key, value in stats.items()}})
+    return pd.DataFrame(rows)
@@ -0,0 +1,182 @@
+import datetime
+import os
+import pickle
+import tempfile
+from urllib.parse import quote
+
+import pandas as pd
+
+
+BAR_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+DEFAULT_CACHE_DIR = os.environ.get(
+    "VIX_TRIGGER_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "vix_trigger")
+)
+# An empty download for a gap longer than this is treated as a failed request
+# (yfinance returns an empty frame on errors) instead of a stretch without trading.
+MAX_EMPTY_GAP_DAYS = 4
+MARKET_TZ = "America/New_York"
+MARKET_CLOSE = datetime.time(16, 0)
+
+_default_store = None
+
+
+def default_store():
+    """Return the process wide BarStore in DEFAULT_CACHE_DIR"""
+    global _default_store
+    if _default_store is None:
+        _default_store = BarStore()
+    return _default_store
+
+
+def last_session(now=None):
+    """Return the date of the last completed trading session (weekdays, holidays are not known)"""
+    now = pd.Timestamp.now(tz=MARKET_TZ) if now is None else pd.Timestamp(now)
+    now = now.tz_localize(MARKET_TZ) if now.tz is None else now.tz_convert(MARKET_TZ)
+    day = now.date()
+    if now.time() < MARKET_CLOSE:
+        day -= datetime.timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= datetime.timedelta(days=1)
+    return day
+
+
+def normalize_bars(data):
+    """Keep the OHLCV columns and index the bars by naive calendar date."""
+    data = data.reindex(columns=BAR_COLUMNS)
+    index = pd.DatetimeIndex(data.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    data.index = index.normalize().rename("Date")
+    return data
+
+
+class BarStore:
+    """On-disk store of daily bars, one file per ticker.
+
+    Every file remembers the date range [start, end) it covers, so a request for a
+    window only downloads the head and/or tail that is not stored yet.
+    """
+    def __init__(self, root=DEFAULT_CACHE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, symbol):
+        return os.path.join(self.root, quote(symbol, safe="") + ".pkl")
+
+    def load(self, symbol):
+        """Return the stored entry {"bars", "start", "end"} for symbol, or None."""
+        try:
+            with open(self.path(symbol), "rb") as f:
+                return pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def save(self, symbol, bars, start, end):
+        # Write to a temporary file first so concurrent readers never see half a file
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump({"bars": bars, "start": start, "end": end}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path(symbol))
+
+    def missing(self, symbol, start, end):
+        """Return the list of (start, end) date ranges that still have to be downloaded."""
+        entry = self.load(symbol)
+        if entry is None:
+            return [(start, end)]
+        gaps = []
+        if start < entry["start"]:
+            gaps.append((start, entry["start"]))
+        if end > entry["end"]:
+            gaps.append((entry["end"], end))
+        return gaps
+
+    def update(self, symbol, downloads, now=None):
+        """Merge downloaded bars into the store.
+
+        An empty download only counts as covered when the gap is short and ends before the
+        last completed session (a weekend or holiday), otherwise it may be a failed request
+        and the gap is asked for again next time.
+
+        Parameters:
+        symbol (str): The ticker symbol
+        downloads (list): (start, end, frame) for every downloaded gap
+        now (datetime): Current time, for tests
+        """
+        settled = last_session(now)
+        entry = self.load(symbol)
+        parts = []
+        if entry is not None:
+            parts.append(entry["bars"])
+            cov_start, cov_end = entry["start"], entry["end"]
+        else:
+            cov_start = cov_end = None
+
+        for start, end, frame in sorted(downloads, key=lambda d: d[0]):
+            if frame.empty and ((end - start).days > MAX_EMPTY_GAP_DAYS or _as_date(end) > settled):
+                continue
+            if not frame.empty:
+                parts.append(normalize_bars(frame))
+            if cov_start is None:
+                cov_start, cov_end = start, end
+            elif start <= cov_end and end >= cov_start:
+                # Only extend the covered range with gaps that touch it
+                cov_start, cov_end = min(cov_start, start), max(cov_end, end)
+
+        if cov_start is None:
+            return
+        bars = pd.concat(parts) if parts else normalize_bars(pd.DataFrame(columns=BAR_COLUMNS))
+        bars = bars[~bars.index.duplicated(keep="last")].sort_index()
+        self.save(symbol, bars, cov_start, cov_end)
+
+    def window(self, symbol, start, end):
+        """Return the stored bars in [start, end)"""
+        entry = self.load(symbol)
+        if entry is None:
+            return normalize_bars(pd.DataFrame(columns=BAR_COLUMNS))
+        bars = entry["bars"]
+        return bars[(bars.index >= pd.Timestamp(start)) & (bars.index < pd.Timestamp(end))]
+
+    def history(self, ticker, start, end):
+        """Return the bars in [start, end) for a yf.Ticker, downloading only what is missing."""
+        symbol = ticker.ticker
+        downloads = []
+        for gap_start, gap_end in self.missing(symbol, start, end):
+            frame = ticker.history(period='1d',
+                start=gap_start.strftime("%Y-%m-%d"), end=gap_end.strftime("%Y-%m-%d")
+            )
+            downloads.append((gap_start, gap_end, frame))
+        if downloads:
+            self.update(symbol, downloads)
+        return self.window(symbol, start, end)
+
+    def history_many(self, symbols, start, end, download):
+        """Return {symbol: bars in [start, end)}, downloading all missing bars in one batch.
+
+        Parameters:
+        symbols (list): The ticker symbols
+        download (callable): download(symbols, start, end) -> {symbol: frame}
+        """
+        gaps = {symbol: self.missing(symbol, start, end) for symbol in symbols}
+        need = [symbol for symbol in symbols if gaps[symbol]]
+        if need:
+            # One request spanning every gap is cheaper than one request per gap
+            fetch_start = min(gap[0] for symbol in need for gap in gaps[symbol])
+            fetch_end = max(gap[1] for symbol in need for gap in gaps[symbol])
+            batch = download(need, fetch_start, fetch_end)
+            for symbol in need:
+                frame = batch.get(symbol)
+                if frame is not None:
+                    self.update(symbol, [(fetch_start, fetch_end, frame)])
+        return {symbol: self.window(symbol, start, end) for symbol in symbols}
+
+
+def _as_date(value):
+    return pd.Timestamp(value).date()
+
+
+def history_window(n_days, now=None):
+    """Return the (start, end) dates of the past n_days, not counting today."""
+    now = now or datetime.datetime.now()
+    start = (now - datetime.timedelta(days=n_days + 1)).date()
+    end = (now - datetime.timedelta(days=1)).date()
+    return start, end
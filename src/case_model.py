@@ -0,0 +1,222 @@
+import numpy as np
+
+# It takes this many days before a vaccination starts to lower R
+VACCINATION_DELAY = 7
+# Up to this many scenarios the immunity feedback loop runs on plain floats
+SCALAR_SCENARIOS = 16
+
+
+def _param(value):
+    """Scenario parameter as a float array with a trailing time axis to broadcast against"""
+    return np.asarray(value, dtype=np.float64)[..., np.newaxis]
+
+
+def _lag(values, days, fill=np.nan):
+    """values shifted `days` steps forward along the time axis, the first days are `fill`"""
+    lagged = np.full_like(values, fill)
+    if days < values.shape[-1]:
+        lagged[..., days:] = values[..., :values.shape[-1] - days]
+    return lagged
+
+
+def _clamp_r(r):
+    # Keep R away from 1 and 0 like the half-life formula of the original dashboard needs
+    r = np.where(r == 1, 1.000001, r)
+    return np.where(r <= 0, 0.000001, r)
+
+
+def _clamp_r_float(r):
+    if r == 1:
+        return 1.000001
+    return 0.000001 if r <= 0 else r
+
+
+def turning_factor(days, turning_point, turning_days, change_factor):
+    """Multiplier of R that moves linearly to change_factor over turning_days from turning_point"""
+    fraction = 1 - (days - turning_point) / turning_days
+    return np.where(days < turning_point, 1.0,
+                    np.where(days < turning_point + turning_days,
+                             change_factor + (1 - change_factor) * fraction, change_factor))
+
+
+def vaccination_factor(days, vaccination_days):
+    """Multiplier of R while everybody is vaccinated in vaccination_days after VACCINATION_DELAY days"""
+    started = days - VACCINATION_DELAY
+    return np.where(days <= VACCINATION_DELAY, 1.0,
+                    np.where(days < vaccination_days + VACCINATION_DELAY,
+                             1 - started / vaccination_days, 0.0000001))
+
+
+def simulate(n_days, positive_tests=20_000, share_second=0.025, R1=0.8, R2=2.5, Tg=4.0, lambdaa=1.0,
+             days_sick=20, cases_day_zero=100, immune_day_zero=1_000, population=17_500_000,
+             test_immune_factor=2.5, immunization=True, turning=None, vaccination_days=None,
+             ic_day_zero=558, hospital_day_zero=1447, ic_days_stay=13, hospital_days_stay=21,
+             test_to_ic=5, test_to_hospital=5, percentage_test_ic=0.7, percentage_test_hospital=4):
+    """Day by day number of cases of two variants with immunity, a turning point and vaccination.
+
+    The model of inspo.main without any Streamlit code. Every float parameter can be an array,
+    all of them broadcast to one batch of scenarios and every output has that batch shape plus
+    a trailing time axis of n_days. The day counts that shift series (days_sick, *_days_stay,
+    test_to_*) are plain ints.
+
+    Parameters:
+    n_days (int): Length of the simulation
+    positive_tests (float): Positive tests on day zero
+    share_second (float): Fraction of the tests on day zero that are the second variant
+    R1, R2 (float): Reproduction number of the first and second variant
+    Tg (float): Generation time in days
+    lambdaa (float): Heterogeneity, R is scaled by (susceptible fraction) ** lambdaa
+    days_sick (int): Average days a case is infectious
+    immunization (bool): Lower R as the number of immune persons grows
+    turning (tuple): (turning_point, turning_days, change_factor) or None, see turning_factor
+    vaccination_days (float): Days needed to vaccinate everybody or None, see vaccination_factor
+
+    Returns a dict of arrays with the names of the series in inspo.main: positivetests1,
+    positivetests2, positivetests12, positivetestsper100k, cummulative1, cummulative2, cummulative12,
+    ratio, walkingR, ry1x, ry2x, totalimmune, suspectible, infected, recovered, hospital, ic,
+    hospital_cumm and ic_cumm. hospital and ic are nan for the days before the first admission.
+    """
+    days = np.arange(n_days)
+    positive_tests, share_second, Tg, lambdaa = map(_param, (positive_tests, share_second, Tg, lambdaa))
+    cases_day_zero, immune_day_zero, population = map(_param, (cases_day_zero, immune_day_zero, population))
+    test_immune_factor = _param(test_immune_factor)
+    ic_day_zero, hospital_day_zero = _param(ic_day_zero), _param(hospital_day_zero)
+    percentage_test_ic, percentage_test_hospital = _param(percentage_test_ic), _param(percentage_test_hospital)
+
+    modifier = np.ones(n_days)
+    if turning is not None:
+        modifier = modifier * turning_factor(days, *map(_param, turning))
+    if vaccination_days is not None:
+        modifier = modifier * vaccination_factor(days, _param(vaccination_days))
+
+    batch = np.broadcast_shapes(*(np.shape(value)[:-1] for value in (
+        _param(R1), _param(R2), share_second, positive_tests, Tg, lambdaa, immune_day_zero, population,
+        test_immune_factor, modifier)))
+    # First and second variant stacked on a leading axis
+    R = np.stack([np.broadcast_to(_param(R1), batch + (1,)), np.broadcast_to(_param(R2), batch + (1,))])
+    share = np.stack([np.broadcast_to(1 - share_second, batch + (1,)), np.broadcast_to(share_second, batch + (1,))])
+
+    shape = (2,) + batch + (n_days,)
+    ry = np.empty(shape)
+    tests = np.empty(shape)
+    ry[..., 0] = R[..., 0]
+    tests[..., 0] = (positive_tests * share)[..., 0]
+
+    if immunization:
+        immune = np.empty(batch + (n_days,))
+        immune[..., 0] = immune_day_zero[..., 0]
+        flat = lambda value: np.broadcast_to(value, batch + value.shape[-1:]).reshape(-1, value.shape[-1])
+        _immunity_feedback(R.reshape(2, -1), flat(lambdaa)[:, 0], flat(np.atleast_1d(modifier)), flat(Tg)[:, 0],
+                           flat(immune_day_zero)[:, 0], flat(population)[:, 0], flat(test_immune_factor)[:, 0],
+                           ry.reshape(2, -1, n_days), tests.reshape(2, -1, n_days), immune.reshape(-1, n_days))
+    else:
+        ry[..., 1:] = _clamp_r(R * modifier)[..., 1:]
+        growth = ry ** (1 / Tg)
+        growth[..., 0] = 1
+        tests[...] = tests[..., :1] * np.cumprod(growth, axis=-1)
+        immune = None
+
+    total = tests.sum(axis=0)
+    # Every day adds its tests, once the population is reached it stays there
+    cummulative = np.minimum(cases_day_zero * share + np.cumsum(tests, axis=-1) - tests[..., :1], population)
+    if immune is None:
+        immune = np.minimum(immune_day_zero + (np.cumsum(total, axis=-1) - total[..., :1]) * test_immune_factor,
+                            population)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = np.where(total > 0, tests[1] / total, 1.0)
+    ratio[..., 0] = share[1, ..., 0]
+    walkingR = ry[0] ** (1 - ratio) * ry[1] ** ratio
+
+    # Infected move to recovered after days_sick, the infected of day zero evenly over the first days_sick
+    inflow = total * test_immune_factor
+    inflow[..., 0] = 0
+    outflow = np.broadcast_to(cases_day_zero / days_sick, inflow.shape).copy()
+    if n_days > days_sick + 1:
+        outflow[..., days_sick + 1:] = (total * test_immune_factor)[..., 1:n_days - days_sick]
+    outflow[..., 0] = 0
+    infected = cases_day_zero + np.cumsum(inflow - outflow, axis=-1)
+    suspectible = population - immune_day_zero - np.cumsum(inflow, axis=-1)
+    recovered = immune_day_zero + np.cumsum(outflow, axis=-1)
+
+    # Admissions follow the tests with a delay, before the first one the series are nan.
+    # Day zero never has admissions, also without a delay
+    hospital_admissions = _lag(total, test_to_hospital, fill=0.0) * (percentage_test_hospital / 100)
+    ic_admissions = _lag(total, test_to_ic, fill=0.0) * (percentage_test_ic / 100)
+    hospital_admissions[..., 0] = 0
+    ic_admissions[..., 0] = 0
+    hospital = np.where(days >= max(test_to_hospital, 1), hospital_admissions, np.nan)
+    ic = np.where(days >= max(test_to_ic, 1), ic_admissions, np.nan)
+    hospital_cumm = _occupation(hospital_admissions, hospital_day_zero, hospital_days_stay, test_to_hospital)
+    ic_cumm = _occupation(ic_admissions, ic_day_zero, ic_days_stay, test_to_ic)
+
+    return {
+        "positivetests1": tests[0],
+        "positivetests2": tests[1],
+        "positivetests12": total,
+        "positivetestsper100k": total / 25,
+        "cummulative1": cummulative[0],
+        "cummulative2": cummulative[1],
+        "cummulative12": np.minimum(cases_day_zero + np.cumsum(total, axis=-1) - total[..., :1], population),
+        "ratio": 100 * ratio,
+        "walkingR": walkingR,
+        "ry1x": ry[0],
+        "ry2x": ry[1],
+        "totalimmune": immune,
+        "suspectible": suspectible,
+        "infected": infected,
+        "recovered": recovered,
+        "hospital": hospital,
+        "ic": ic,
+        "hospital_cumm": hospital_cumm,
+        "ic_cumm": ic_cumm,
+    }
+
+
+def _immunity_feedback(R, lambdaa, modifier, Tg, immune_day_zero, population, test_immune_factor,
+                       ry, tests, immune):
+    """Fill ry, tests and immune day by day, R depends on the immunity built up the day before.
+
+    All arrays are flattened to S scenarios: R (2, S), the parameters (S,), modifier (S, days),
+    ry and tests (2, S, days) and immune (S, days), day zero of the outputs is filled in already.
+    """
+    n_scenarios, n_days = immune.shape
+    susceptible_start = population - immune_day_zero
+    growth_power = 1 / Tg
+    if n_scenarios <= SCALAR_SCENARIOS:
+        # A few scenarios: plain floats, the per-call overhead of NumPy would dominate
+        for s in range(n_scenarios):
+            r1_start, r2_start = R[0, s], R[1, s]
+            t1, t2, total_immune = tests[0, s, 0], tests[1, s, 0], immune[s, 0]
+            ry1_row, ry2_row, t1_row, t2_row, immune_row = ry[0, s], ry[1, s], tests[0, s], tests[1, s], immune[s]
+            for day, factor in enumerate(modifier[s].tolist()[1:], start=1):
+                ratio = (1 - (total_immune - immune_day_zero[s]) / susceptible_start[s]) ** lambdaa[s]
+                ry1 = _clamp_r_float(r1_start * ratio * factor)
+                ry2 = _clamp_r_float(r2_start * ratio * factor)
+                # 0.5 ** (1 / half-life) with half-life Tg * log(0.5) / log(R) is R ** (1 / Tg)
+                t1 = t1 * ry1 ** growth_power[s]
+                t2 = t2 * ry2 ** growth_power[s]
+                total_immune = min(total_immune + (t1 + t2) * test_immune_factor[s], population[s])
+                ry1_row[day], ry2_row[day], t1_row[day], t2_row[day], immune_row[day] = ry1, ry2, t1, t2, total_immune
+        return
+
+    # Many scenarios: a loop over the days, vectorized over the scenarios
+    for day in range(1, n_days):
+        ratio = (1 - (immune[:, day - 1] - immune_day_zero) / susceptible_start) ** lambdaa
+        ry[:, :, day] = _clamp_r(R * (ratio * modifier[:, day]))
+        tests[:, :, day] = tests[:, :, day - 1] * ry[:, :, day] ** growth_power
+        immune[:, day] = np.minimum(immune[:, day - 1] + tests[:, :, day].sum(axis=0) * test_immune_factor,
+                                    population)
+
+
+def _occupation(admissions, day_zero, days_stay, delay):
+    """Occupied beds: admissions (0 before the first) stay days_stay days, the patients of
+    day zero leave evenly"""
+    n_days = admissions.shape[-1]
+    days = np.arange(n_days)
+    leaving = np.where(days < days_stay, day_zero / days_stay, 0.0) + _lag(admissions, days_stay, fill=0.0)
+    # Admissions only count from the day after the first one, like the original model
+    arriving = np.where(days > delay, admissions, 0.0)
+    delta = arriving - leaving
+    delta[..., 0] = 0
+    return day_zero + np.cumsum(delta, axis=-1)
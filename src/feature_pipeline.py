@@ -0,0 +1,70 @@
+import pickle
+
+import numpy as np
+
+from windowing import sliding_windows
+
+
+class FeaturePipeline:
+    """Column selection, scaling and windowing of the model inputs.
+
+    Fitted once on the training frame, after that transform() and windows() are pure
+    and never refit the scalers, so inference sees inputs scaled exactly like training.
+    The fitted pipeline pickles and is stored next to the model in the registry.
+
+    Parameters:
+    target (int or str): Index or name of the column to predict
+    steps (int): Window length
+    columns (list): Columns to use, all columns of the training frame by default
+    """
+    def __init__(self, target, steps=15, columns=None):
+        self.target = target
+        self.steps = steps
+        self.columns = columns
+        self.sc = None
+        self.sc_target = None
+
+    @property
+    def target_ind(self):
+        return self.target if isinstance(self.target, (int, np.integer)) else self.columns.index(self.target)
+
+    @property
+    def fitted(self):
+        return self.sc is not None
+
+    def fit(self, frame):
+        from sklearn.preprocessing import MinMaxScaler
+        if self.columns is None:
+            self.columns = list(frame.columns)
+        values = frame[self.columns].to_numpy(dtype=np.float64)
+        self.sc = MinMaxScaler(feature_range=(0, 1)).fit(values)
+        self.sc_target = MinMaxScaler(feature_range=(0, 1)).fit(values[:, [self.target_ind]])
+        return self
+
+    def transform(self, frame):
+        """Scaled (rows, features) float32 matrix of the pipeline's columns"""
+        if not self.fitted:
+            raise RuntimeError("FeaturePipeline has to be fitted before it can transform")
+        return self.sc.transform(frame[self.columns].to_numpy(dtype=np.float64)).astype(np.float32)
+
+    def windows(self, frame):
+        """(samples, steps, features) windows of the scaled frame, see windowing.sliding_windows"""
+        return sliding_windows(self.transform(frame), self.steps)
+
+    def training_windows(self, frame):
+        """Windows plus the scaled target that follows every window"""
+        scaled = self.transform(frame)
+        return sliding_windows(scaled, self.steps), scaled[self.steps:, self.target_ind]
+
+    def inverse_target(self, predictions):
+        """Scaled target predictions back to prices"""
+        return self.sc_target.inverse_transform(np.asarray(predictions).reshape(-1, 1))
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump(self, f)
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
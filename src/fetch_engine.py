@@ -0,0 +1,123 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import yfinance as yf
+
+from yfinanceScraper import Scraper
+
+
+class FetchEngine:
+    """Runs many per-ticker requests at once with bounded parallelism.
+
+    Every request gets a timeout and is retried with exponential backoff, so the
+    wall time of a batch is close to the slowest single request instead of the sum.
+
+    Parameters:
+    max_concurrency (int): Maximum number of requests in flight at once
+    retries (int): Number of extra attempts after a failed or timed out request
+    backoff (float): Seconds to wait before the first retry, doubled for every retry after
+    timeout (float): Seconds a single attempt may run before it is given up, counted from
+        the moment it starts running, not while it waits for a free worker
+    queue_timeout (float): Seconds an attempt may wait for a free worker, None waits as long as it takes
+    ticker_factory (callable): Builds the ticker object for a symbol, yf.Ticker by default.
+        Pass a fake to test without network access.
+    """
+    def __init__(self, max_concurrency=8, retries=2, backoff=0.5, timeout=15.0, queue_timeout=60.0,
+                 ticker_factory=None):
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.ticker_factory = ticker_factory
+        self.errors = {}
+        # One worker per allowed request: a timed out call keeps its worker until it really
+        # returns, so no more than max_concurrency requests ever reach the server at once
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="fetch")
+
+    def ticker(self, symbol):
+        factory = self.ticker_factory or yf.Ticker
+        return factory(symbol)
+
+    async def _attempt(self, fn):
+        """Run fn on a worker, timing it from the moment a worker picks it up"""
+        loop = asyncio.get_running_loop()
+        started = loop.create_future()
+
+        def run():
+            try:
+                loop.call_soon_threadsafe(_set_started, started)
+            except RuntimeError:  # The loop is gone, nobody waits for this result any more
+                pass
+            return fn()
+
+        running = loop.run_in_executor(self._executor, run)
+        try:
+            await asyncio.wait_for(started, self.queue_timeout)
+        except asyncio.TimeoutError:
+            # Still queued: cancelling takes it out of the queue before it ever runs
+            running.cancel()
+            raise
+        return await asyncio.wait_for(running, self.timeout)
+
+    async def _call(self, fn):
+        for attempt in range(self.retries + 1):
+            try:
+                return await self._attempt(fn)
+            except Exception as error:
+                last_error = error
+            if attempt < self.retries:
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+        raise last_error
+
+    async def _gather(self, calls):
+        keys = list(calls)
+        outcomes = await asyncio.gather(*(self._call(calls[key]) for key in keys), return_exceptions=True)
+        return dict(zip(keys, outcomes))
+
+    def run(self, calls):
+        """Run {key: callable} concurrently.
+
+        Returns a dict of key -> result for the calls that succeeded. The exception of
+        every call that failed after all retries is kept in self.errors.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            outcomes = asyncio.run(self._gather(calls))
+        else:
+            # Called from inside an event loop (a notebook, an async server): asyncio.run would
+            # refuse, so the batch gets a loop of its own on a separate thread
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="fetch-loop") as runner:
+                outcomes = runner.submit(asyncio.run, self._gather(calls)).result()
+        results = {key: value for key, value in outcomes.items() if not isinstance(value, Exception)}
+        self.errors = {key: value for key, value in outcomes.items() if isinstance(value, Exception)}
+        return results
+
+    def histories(self, symbols, n_days=30, store=None):
+        """Get the historic data of every symbol, formatted like Scraper.get_historic_data"""
+        return self.run({
+            symbol: functools.partial(Scraper.get_historic_data, self.ticker(symbol), n_days, store)
+            for symbol in symbols
+        })
+
+    def quotes(self, symbols):
+        """Get the current price of every symbol"""
+        def quote(symbol):
+            return self.ticker(symbol).info.get("regularMarketPrice")
+        return self.run({symbol: functools.partial(quote, symbol) for symbol in symbols})
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _set_started(future):
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,81 @@
+import numpy as np
+
+
+class WindowRing:
+    """Preallocated ring buffer with the last `steps` rows of a batch of scenarios.
+
+    Every row is written twice, at `head` and at `head + steps`, so the current window
+    is always the slice buffer[:, head:head + steps], in time order and without copying.
+    """
+    def __init__(self, windows):
+        windows = np.asarray(windows, dtype=np.float32)
+        self.n_scenarios, self.steps, self.n_features = windows.shape
+        self.buffer = np.empty((self.n_scenarios, 2 * self.steps, self.n_features), dtype=np.float32)
+        self.buffer[:, :self.steps] = windows
+        self.buffer[:, self.steps:] = windows
+        self.head = 0
+
+    def window(self):
+        """The (scenarios, steps, features) window, oldest row first"""
+        return self.buffer[:, self.head:self.head + self.steps]
+
+    def last(self):
+        return self.buffer[:, self.head + self.steps - 1]
+
+    def push(self, rows):
+        """Append one row per scenario, dropping the oldest"""
+        self.buffer[:, self.head] = rows
+        self.buffer[:, self.head + self.steps] = rows
+        self.head = (self.head + 1) % self.steps
+
+
+def forecast(predict, windows, horizon, target_cols):
+    """Forecast `horizon` steps ahead by feeding every prediction back into the window.
+
+    All scenarios (e.g. one per ticker) advance together, one predict call per step.
+    The predicted value replaces the target column of the next row, the other
+    features are carried forward from the last known row.
+
+    Parameters:
+    predict (callable): predict(X) with X (scenarios, steps, features) -> (scenarios,) values
+    windows (array): The last known (scaled) window of every scenario, (scenarios, steps, features)
+    horizon (int): Number of steps to forecast
+    target_cols (int or array): Column of the predicted value, per scenario or for all
+
+    Returns the forecast paths as a (scenarios, horizon) array in the scaled space
+    """
+    ring = WindowRing(windows)
+    rows = np.arange(ring.n_scenarios)
+    target_cols = np.broadcast_to(target_cols, (ring.n_scenarios,))
+    paths = np.empty((ring.n_scenarios, horizon), dtype=np.float32)
+    for step in range(horizon):
+        predicted = np.asarray(predict(ring.window()), dtype=np.float32).reshape(ring.n_scenarios, -1)[:, 0]
+        paths[:, step] = predicted
+        next_rows = ring.last().copy()
+        next_rows[rows, target_cols] = predicted
+        ring.push(next_rows)
+    return paths
+
+
+def grouped_predict(models, model_ids, outputs=None):
+    """Build a predict function for forecast() over scenarios served by different models.
+
+    Parameters:
+    models (list): Keras style models with predict_on_batch
+    model_ids (array): Index into models for every scenario
+    outputs (array): Output column of every scenario, for multi-output models
+
+    Every model gets a single predict_on_batch call per step with all of its scenarios.
+    """
+    model_ids = np.asarray(model_ids)
+    groups = [(model, np.flatnonzero(model_ids == i)) for i, model in enumerate(models)]
+    outputs = np.zeros(len(model_ids), dtype=np.int64) if outputs is None else np.asarray(outputs)
+
+    def predict(X):
+        result = np.empty(len(model_ids), dtype=np.float32)
+        for model, index in groups:
+            if len(index):
+                predictions = np.asarray(model.predict_on_batch(X[index])).reshape(len(index), -1)
+                result[index] = predictions[np.arange(len(index)), outputs[index]]
+        return result
+    return predict
@@ -0,0 +1,166 @@
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+import numpy as np
+
+import forecast as forecast_util
+
+# Models kept in memory, the least recently used one is dropped beyond this
+MAX_MODELS = 16
+
+_default_predictor = None
+
+
+def default_predictor():
+    """Return the process wide BatchPredictor, shared by every session of the app"""
+    global _default_predictor
+    if _default_predictor is None:
+        _default_predictor = BatchPredictor()
+    return _default_predictor
+
+
+class BatchPredictor:
+    """Keeps models in memory and answers prediction requests in large batches.
+
+    Requests from any thread go into one queue. A worker thread takes what arrived
+    within `max_wait` seconds (up to `max_batch_size` windows), groups it per model and
+    runs a single predict_on_batch call per model, then hands every caller its own rows.
+    Anything with a Keras style predict_on_batch works as a model, e.g. a small
+    model.model_build((15, 6), dict(model.ARCHITECTURE, lstm_units=(8,))) in tests.
+    At most `max_models` models are kept, requests for an evicted one fail with KeyError
+    until it is added again, unless the request brings its own model (see submit).
+    """
+    def __init__(self, max_batch_size=1024, max_wait=0.005, max_models=MAX_MODELS):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_models = max_models
+        self.models = OrderedDict()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=10_000)
+        self._counts = {"requests": 0, "samples": 0, "batches": 0, "predict_seconds": 0.0}
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="batch-predictor", daemon=True)
+        self._thread.start()
+
+    def add_model(self, name, model):
+        """Keep model under name, evicting the least recently used models beyond max_models"""
+        with self._lock:
+            self.models[name] = model
+            self.models.move_to_end(name)
+            while len(self.models) > self.max_models:
+                self.models.popitem(last=False)
+
+    def get_model(self, name):
+        """The model of name, marked as most recently used, KeyError if it is not kept"""
+        with self._lock:
+            self.models.move_to_end(name)
+            return self.models[name]
+
+    def submit(self, name, X, model=None):
+        """Queue windows X (samples, steps, features) for model `name`, returns a Future.
+
+        A request given its model is answered by that model even if `name` was evicted
+        in the meantime, requests without one use the kept model of `name`.
+        """
+        future = Future()
+        self._queue.put((name, np.asarray(X, dtype=np.float32), future, time.perf_counter(), model))
+        return future
+
+    def predict(self, name, X, timeout=None, model=None):
+        return self.submit(name, X, model).result(timeout)
+
+    def forecast(self, name, windows, horizon, target_cols, timeout=None, model=None):
+        """Forecast `horizon` steps past every window, see forecast.forecast.
+
+        Every step is one request, batched with whatever else arrives at the same time.
+        Returns a (windows, horizon) array in the scaled space.
+        """
+        def predict(X):
+            return self.predict(name, np.ascontiguousarray(X), timeout, model)
+        return forecast_util.forecast(predict, windows, horizon, target_cols)
+
+    def predict_many(self, inputs, timeout=None):
+        """Predict {name: X} at once, returns {name: predictions}"""
+        futures = {name: self.submit(name, X) for name, X in inputs.items()}
+        return {name: future.result(timeout) for name, future in futures.items()}
+
+    def _collect(self):
+        requests = [self._queue.get()]
+        if requests[0] is None:
+            return requests
+        size = len(requests[0][1])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)
+                break
+            requests.append(request)
+            size += len(request[1])
+        return requests
+
+    def _run(self):
+        while True:
+            requests = self._collect()
+            if requests[0] is None:
+                return
+            groups = {}
+            for request in requests:
+                # Requests that bring different models under one name are predicted apart
+                groups.setdefault((request[0], id(request[4])), []).append(request)
+            for (name, _), group in groups.items():
+                self._predict_group(name, group, group[0][4])
+
+    def _predict_group(self, name, group, model=None):
+        try:
+            if model is None:
+                model = self.get_model(name)
+            batch = np.concatenate([X for _, X, _, _, _ in group])
+            start = time.perf_counter()
+            predictions = np.asarray(model.predict_on_batch(batch))
+            elapsed = time.perf_counter() - start
+        except Exception as error:
+            for _, _, future, _, _ in group:
+                future.set_exception(error)
+            return
+
+        done = time.perf_counter()
+        offset = 0
+        with self._lock:
+            self._counts["batches"] += 1
+            self._counts["predict_seconds"] += elapsed
+            for _, X, future, submitted, _ in group:
+                future.set_result(predictions[offset:offset + len(X)])
+                offset += len(X)
+                self._counts["requests"] += 1
+                self._counts["samples"] += len(X)
+                self._latencies.append(done - submitted)
+
+    def stats(self):
+        """Throughput and latency (seconds) of the requests answered so far"""
+        with self._lock:
+            counts = dict(self._counts)
+            latencies = np.array(self._latencies)
+        uptime = time.perf_counter() - self._started
+        stats = {
+            **counts,
+            "samples_per_second": counts["samples"] / uptime if uptime else 0.0,
+            "mean_batch_size": counts["samples"] / counts["batches"] if counts["batches"] else 0.0,
+        }
+        if len(latencies):
+            stats.update({f"latency_p{p}": float(np.percentile(latencies, p)) for p in (50, 95, 99)})
+        return stats
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
@@ -10,20 +10,317 @@
 # Sorry for all the commented out code, maybe I will combine the old and new version(s) later
 
 # Import our modules that we are using
-import math
+import io
 from datetime import datetime
 
 import streamlit as st
 import numpy as np
 import matplotlib.dates as mdates
 import datetime as dt
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_agg import RendererAgg
+from matplotlib.figure import Figure
 from matplotlib.font_manager import FontProperties
-_lock = RendererAgg.lock
-from scipy.integrate import odeint
 import pandas as pd
 
+import case_model
+import reproduction
+import sir_model
+
+# Simulations and rendered figures are shared by all sessions, bounded and expiring
+CACHE_TTL = 3600
+
+
+@st.cache_data(max_entries=64, ttl=CACHE_TTL, show_spinner=False)
+def simulate_cases(n_days, params):
+    """case_model.simulate for a parameter tuple ((name, value), ...), cached on it"""
+    return case_model.simulate(n_days, **dict(params))
+
+
+@st.cache_data(max_entries=64, ttl=CACHE_TTL, show_spinner=False)
+def simulate_sir(days, Rstart, Tg, N, I0, R0):
+    """Classical SIR, its uncertainty band and the R number it implies, cached on the parameters"""
+    # https://scipython.com/book/chapter-8-scipy/additional-examples/the-sir-epidemic-model/
+    sir = sir_model.solve(days, Rstart, Tg, N, I0, R0)
+    # The same model for R and the generation time around the chosen values, in one batch
+    R_grid, Tg_grid = np.meshgrid(np.linspace(0.8, 1.2, 20) * Rstart, np.linspace(max(Tg - 1, 1), Tg + 1, 10))
+    sir["bands"] = sir_model.percentile_bands(sir_model.solve(days, R_grid, Tg_grid, N, I0, R0)["I"])
+    # New cases and the R number they imply, masked where they are undefined
+    sir["Cnew"] = reproduction.incidence(sir["C"])
+    sir["repr"] = reproduction.instantaneous_r(sir["C"], Tg)
+    sir["repr"][0] = Rstart
+    return sir
+
+
+def configgraph(fig, ax, titlex, x, o):
+    interval_ = max(int(o["numberofdays"] / 20), 1)
+    ax.set_xlabel('date')
+    ax.set_xlim(x[0], x[-1])
+    todaylabel = "Today ("+ o["today"] + ")"
+    ax.axvline(x=x[0]+o["datediff"], color='yellow', alpha=.6,linestyle='--',label = todaylabel)
+    # Add a grid
+    ax.grid(alpha=.4,linestyle='--')
+
+    #Add a Legend
+    fontP = FontProperties()
+    fontP.set_size('xx-small')
+    ax.legend(  loc='best', prop=fontP)
+
+    # lay-out of the x axis
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
+    ax.xaxis.set_major_locator(mdates.DayLocator(interval=interval_))
+    fig.autofmt_xdate()
+    ax.set_title(titlex , fontsize=10)
+
+
+def getsecondax(ax, Tg):
+    # get second y axis
+    # Door Han-Kwang Nienhuys - MIT License
+    # https://github.com/han-kwang/covid19/blob/master/nlcovidstats.py
+    ax2 = ax.twinx()
+    T2s = np.array([-2, -4,-7, -10, -11,-14, -21, -60, 9999, 60, 21, 14, 11,10, 7, 4, 2])
+    y2ticks = 2**(Tg/T2s)
+    y2labels = [f'{t2 if t2 != 9999 else "∞"}' for t2 in T2s]
+    ax2.set_yticks(y2ticks)
+    ax2.set_yticklabels(y2labels)
+    ax2.set_ylim(*ax.get_ylim())
+    ax2.set_ylabel('Halverings-/verdubbelingstijd (dagen)')
+
+
+# POS TESTS /day ################################
+def plot_positive_tests(fig, ax, s, o):
+    x = s["x"]
+    ax.plot(x, s["positivetests1"], label=o["label1"],  linestyle='--')
+    ax.plot(x, s["positivetests2"], label=o["label2"],  linestyle='--')
+    ax.plot(x, s["positivetests12"], label='Total')
+
+    # Add X and y Label and limits
+    ax.set_ylabel('positive tests per day')
+    ax.set_ylim(bottom = 0)
+
+    ax.fill_between(x, 0, 875, color='#f392bd',  label='waakzaam')
+    ax.fill_between(x, 876, 2500, color='#db5b94',  label='zorgelijk')
+    ax.fill_between(x, 2501, 6250, color='#bc2165',  label='ernstig')
+    ax.fill_between(x, 6251, 10000, color='#68032f', label='zeer ernstig')
+    ax.fill_between(x, 10000, 20000, color='grey', alpha=0.3, label='zeer zeer ernstig')
+
+    # Add a title
+    titlex = (
+        'Pos. tests per day.\n'
+        'Number of cases on '+ str(o["startdate"]) + ' = ' + str(o["numberofpositivetests"]) + '\n')
+    configgraph(fig, ax, titlex, x, o)
+
+
+# # POS TESTS per 100k per week ################################
+def plot_per_100k(fig, ax, s, o):
+    x = s["x"]
+    ax.plot(x, s["positivetestsper100k"])
+
+    # Add X and y Label and limits
+    ax.set_ylabel('new positive tests per 100k per week')
+    ax.set_ylim(bottom = 0)
+
+    # add horizontal lines and surfaces
+    ax.fill_between(x, 0, 35, color='yellow', alpha=0.3, label='waakzaam')
+    ax.fill_between(x, 36, 100, color='orange', alpha=0.3, label='zorgelijk')
+    ax.fill_between(x, 101, 250, color='red', alpha=0.3, label='ernstig')
+    ax.fill_between(x, 251, 500, color='purple', alpha=0.3, label='zeer ernstig')
+    ax.fill_between(x, 501, 1000, color='grey', alpha=0.3, label='zeer zeer ernstig')
+
+    ax.axhline(y=0, color='green', alpha=.6,linestyle='--' )
+    ax.axhline(y=35, color='yellow', alpha=.6,linestyle='--')
+    ax.axhline(y=100, color='orange', alpha=.6,linestyle='--')
+    ax.axhline(y=250, color='red', alpha=.6,linestyle='--')
+    ax.axhline(y=500, color='purple', alpha=.6,linestyle='--')
+
+    # Add a title
+    titlex = ( 'New pos. tests per 100k per week.\n'  )
+    configgraph(fig, ax, titlex, x, o)
+
+
+# Show cummulative cases
+def plot_cummulative(fig, ax, s, o):
+    x = s["x"]
+    ax.plot(x, s["cummulative1"], label='Cummulative pos. test first variant',  linestyle='--')
+    ax.plot(x, s["cummulative2"], label='Cummulative pos. test second variant',  linestyle='--')
+    ax.plot(x, s["cummulative12"], label='Cummulative pos. test TOTAL',)
+
+    # Add X and y Label and limits
+    ax.set_ylabel('Total positive tests')
+    ax.set_ylim(bottom = 0)
+
+    # Add a title
+    titlex = ('Cummulative positive tests\nNo recovery/death in this graph')
+
+    configgraph(fig, ax, titlex, x, o)
+
+    ax.axhline(y=1, color='yellow', alpha=.6,linestyle='--')
+
+
+# Infected
+def plot_infected(fig, ax, s, o):
+    x = s["x"]
+    ax.plot(x, s["suspectible"], label='Suspectible',  linestyle='--')
+    ax.plot(x, s["infected"], label='Infected',  linestyle='--')
+    ax.plot(x, s["recovered"], label='Recovered',  linestyle='--')
+
+    # Add  y Label and limits
+    ax.set_ylabel('No of cases')
+    ax.set_ylim(bottom = 0)
+
+    # Add a title
+    titlex = ('Suspectible - Infected - Recovered.\nBased on positive tests.\n'
+            '(test/immunityfactor is taken in account)')
+    configgraph(fig, ax, titlex, x, o)
+
+
+# Show the percentage new variant
+def plot_ratio(fig, ax, s, o):
+    x = s["x"]
+    ax.plot(x, s["ratio"], label='Ratio',  linestyle='--')
+
+    # Add  y Label and limits
+    ax.set_ylabel('ratio')
+    ax.set_ylim(bottom = 0)
+
+    # Add a title
+    titlex = ('Percentage new variant.\n')
+    configgraph(fig, ax, titlex, x, o)
+    ax.axhline(y=50, color='yellow', alpha=.6,linestyle='--')
+
+
+# Show the R number in time
+def plot_r_number(fig, ax, s, o):
+    x = s["x"]
+    ax.plot(x, s["walkingR"], label='Combined R number in time',  linestyle='--')
+    ax.plot(x, s["ry1x"], label='Old variant',  linestyle='--')
+    ax.plot(x, s["ry2x"], label='New variant',  linestyle='--')
+
+    # Add X and y Label and limits
+    ax.set_ylabel('R-number')
+
+    # Add a title
+    titlex = ('R number in time.\n')
+    configgraph(fig, ax, titlex, x, o)
+    ax.axhline(y=1, color='yellow', alpha=.6,linestyle='--')
+    getsecondax(ax, o["Tg"])
+
+
+# Ziekenhuis opnames
+def plot_admissions(fig, ax, s, o):
+    x = s["x"]
+    ax.plot(x, s["hospital"], label='Ziekenhuis per dag')
+    ax.plot(x, s["ic"], label='IC per dag')
+    # Add X and y Label and limits
+
+    ax.set_ylabel('Ziekenhuis- en IC-opnames per day')
+    ax.set_ylim(bottom = 0)
+    ax.axhline(y=0, color='green', alpha=.6,linestyle='--' )
+    ax.axhline(y=12, color='yellow', alpha=.6,linestyle='--')
+    ax.axhline(y=40, color='orange', alpha=.6,linestyle='--')
+    ax.axhline(y=80, color='red', alpha=.6,linestyle='--')
+    # https://twitter.com/YorickB/status/1369253144014782466/photo/1
+    # Add a title
+    titlex = ('Ziekenhuis ('+str(o["percentage_test_hospital"])+ ' %) en IC ('+str(o["percentage_test_ic"])+' %) opnames per day,\n7 dgn vertraging')
+    configgraph(fig, ax, titlex, x, o)
+
+
+# Ziekenhuis bezetting
+def plot_occupation(fig, ax, s, o):
+    x = s["x"]
+    ax.plot(x, s["hospital_cumm"], label='Ziekenhuis bezetting per dag')
+    ax.plot(x, s["ic_cumm"], label='IC bezetting per dag')
+    # Add X and y Label and limits
+
+    ax.set_ylabel('Ziekenhuis- en IC-bezetting per day')
+    ax.set_ylim(bottom = 0)
+    ax.axhline(y=1300, color='blue', alpha=.6,linestyle='--' )
+    ax.axhline(y=750, color='yellow', alpha=.6,linestyle='--')
+    ax.axhline(y=1000, color='orange', alpha=.6,linestyle='--')
+    ax.axhline(y=1500, color='red', alpha=.6,linestyle='--')
+
+    # Add a title
+    titlex = (f'Ziekenhuis ({o["percentage_test_hospital"]}%) en IC ({o["percentage_test_ic"]}%) bezetting per day,ZEER vereenvoudigd')
+    configgraph(fig, ax, titlex, x, o)
+
+
+# Plot the data on three separate curves for S(t), I(t) and R(t)
+def plot_sir(fig, ax, s, o):
+    x = s["x"]
+    ax.plot(x, s["S"], 'b', alpha=0.5, lw=2, label='Susceptible')
+    ax.plot(x, s["I"], 'r', alpha=0.5, lw=2, label='Infected')
+    ax.plot(x, s["Cnew"], 'yellow', alpha=0.5, lw=2, label='New Cases')
+    ax.plot(x, s["R"], 'g', alpha=0.5, lw=2, label='Recovered with immunity')
+    ax.set_xlabel('Time (days)')
+    ax.set_ylabel('Number')
+    ax.yaxis.set_tick_params(length=0)
+    ax.xaxis.set_tick_params(length=0)
+    titlex = 'SIR based on cases first day'
+    configgraph(fig, ax, titlex, x, o)
+
+
+# Uncertainty band
+def plot_sir_band(fig, ax, s, o):
+    x, bands = s["x"], s["bands"]
+    ax.fill_between(x, bands[0], bands[-1], color='r', alpha=0.2, label='Infected (5-95 percentile)')
+    ax.plot(x, bands[1], 'r', alpha=0.5, lw=2, label='Infected (median)')
+    ax.set_xlabel('Time (days)')
+    ax.set_ylabel('Number')
+    titlex = 'SIR with R ±20% and generation time ±1 day'
+    configgraph(fig, ax, titlex, x, o)
+
+
+# New cases
+def plot_new_cases(fig, ax, s, o):
+    x = s["x"]
+    ax.plot(x, s["Cnew"], 'y', alpha=0.5, lw=2, label='New Cases')
+    ax.set_xlabel('Time (days)')
+    ax.set_ylabel('Number')
+    ax.yaxis.set_tick_params(length=0)
+    ax.xaxis.set_tick_params(length=0)
+    titlex = 'New cases'
+    configgraph(fig, ax, titlex, x, o)
+
+
+# Gliding R number
+def plot_gliding_r(fig, ax, s, o):
+    x = s["x"]
+    ax.plot(x, s["repr"], 'b', alpha=0.5, lw=2, label='R getal_ based on Cnew')
+    ax.set_xlabel('Time (days)')
+    ax.set_ylabel('R getal')
+    ax.axhline(y=1, color='yellow', alpha=.6,linestyle='--')
+    titlex = "Gliding R-number"
+    configgraph(fig, ax, titlex, x, o)
+
+
+FIGURES = {
+    "positive_tests": plot_positive_tests,
+    "per_100k": plot_per_100k,
+    "cummulative": plot_cummulative,
+    "infected": plot_infected,
+    "ratio": plot_ratio,
+    "r_number": plot_r_number,
+    "admissions": plot_admissions,
+    "occupation": plot_occupation,
+    "sir": plot_sir,
+    "sir_band": plot_sir_band,
+    "new_cases": plot_new_cases,
+    "gliding_r": plot_gliding_r,
+}
+
+
+@st.cache_data(max_entries=256, ttl=CACHE_TTL, show_spinner=False)
+def render(name, key, options, _series):
+    """PNG bytes of figure `name`, cached on the key of the simulation it shows and the display options.
+
+    Drawn on a Figure of its own instead of pyplot, so there is no shared pyplot state and
+    sessions do not have to wait for the global Agg renderer lock.
+    """
+    fig = Figure()
+    FIGURES[name](fig, fig.subplots(), _series, options)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    return buffer.getvalue()
+
+
 def main():
 
     # VARIABLES
@@ -50,8 +347,6 @@ def main():
         st.stop()
 
     NUMBEROFDAYS = st.sidebar.slider('Number of days in graph', 15, 720, 60)
-    global numberofdays_
-    numberofdays_ = NUMBEROFDAYS
 
     Rnew_1_ = st.sidebar.number_input('R-number first variant', 0.1, 10.0, 0.8)
     Rnew_2_ = st.sidebar.number_input('R-number second variant', 0.1, 6.0, 2.50)
@@ -62,8 +357,6 @@ def main():
     percentagenewversion = (st.sidebar.number_input('Percentage second variant at start', 0.0, 100.0, 2.5)/100)
 
     Tg = st.sidebar.slider('Generation time', 2.0, 11.0, 4.0)
-    global Tg_
-    Tg_=Tg
 
     lambdaa = st.sidebar.number_input('Lambda / heterogeneity', 1.0, 10.0, 1.0)
     averagedayssick = (st.sidebar.slider('Average days infectious', 1, 30, 20))
@@ -148,10 +441,6 @@ def main():
     # See https://www.reddit.com/r/epidemiology/comments/lfk83s/real_r0_at_the_start_not_the_same_as_given_r0/
 
 
-    numberofpositivetests1 = numberofpositivetests*(1-percentagenewversion)
-    numberofpositivetests2 = numberofpositivetests*(percentagenewversion)
-    numberofpositivetests12 = numberofpositivetests
-
     # Some manipulation of the x-values (the dates)
     then = startx + dt.timedelta(days=NUMBEROFDAYS)
     x = mdates.drange(startx,then,dt.timedelta(days=1))
@@ -164,34 +453,31 @@ def main():
     b_ = dt.datetime.strptime(b,'%m/%d/%Y').date()
     datediff = ( abs((a_ - b_).days))
 
-    # TODO:  Transform this in a multi dimensional list
-
-    positivetests1 = []
-    positivetests2 = []
-    positivetests12 = []
-    positivetestsper100k = []
-    cummulative1 = []
-    cummulative2 = []
-    cummulative12 = []
-    #walkingcummulative = []
-    ratio=[]
-    walkingR=[]
-    actualR=[]
-    totalimmune=[]
-    hospital = []
-    infected = []
-    ic  = []
-    ic_cumm = []
-    hospital_cumm = []
-    #if vaccination:
-    ry1x = []
-    ry2x = []
-
-    suspectible =[]
-    recovered = []
+    # START CALCULATING --------------------------------------------------------------------
+    # The model itself lives in case_model, results are cached on the parameters so a rerun
+    # that only changes what is shown does not simulate again
+    params = dict(positive_tests=numberofpositivetests, share_second=percentagenewversion,
+                  R1=Rnew1_, R2=Rnew2_, Tg=Tg, lambdaa=lambdaa, days_sick=averagedayssick,
+                  immunization=showimmunization,
+                  turning=(turningpoint, turningdays, changefactor) if turning else None,
+                  vaccination_days=VACTIME if vaccination else None,
+                  ic_day_zero=ic_dayzero, hospital_day_zero=hospital_dayzero,
+                  ic_days_stay=ic_days_stay, hospital_days_stay=hospital_days_stay,
+                  test_to_ic=from_test_to_ic, test_to_hospital=from_test_to_hospital,
+                  percentage_test_ic=percentage_test_ic, percentage_test_hospital=percentage_test_hospital)
+    if showcummulative or showSIR:
+        params["cases_day_zero"] = numberofcasesdayzero
     if showcummulative or showSIR or showimmunization:
-        suspectible.append(totalpopulation -totalimmunedayzero)
-        recovered.append(totalimmunedayzero )
+        params.update(immune_day_zero=totalimmunedayzero, population=totalpopulation,
+                      test_immune_factor=testimmunefactor)
+    params = tuple(sorted(params.items()))
+    cases = simulate_cases(NUMBEROFDAYS, params)
+    cases_key = ("cases", NUMBEROFDAYS, params)
+    cases_series = dict(cases, x=x)
+
+    recovered = cases["recovered"]
+    hospital_cumm, ic_cumm = cases["hospital_cumm"], cases["ic_cumm"]
+
     if turning == False:
         label1= 'First variant (R='+ str(Rnew1_) + ')'
         label2= 'Second variant (R='+ str(Rnew2_) + ')'
@@ -199,200 +485,13 @@ def main():
         label1= 'First variant'
         label2= 'Second variant'
 
-    # START CALCULATING --------------------------------------------------------------------
-    positivetests1.append (numberofpositivetests1)
-    positivetests2.append (numberofpositivetests2)
-    positivetests12.append (numberofpositivetests12)
-    positivetestsper100k.append ((numberofpositivetests12/25))
-
-    if showcummulative:
-        cummulative1.append(numberofcasesdayzero*(1-percentagenewversion))
-        cummulative2.append(numberofcasesdayzero*(percentagenewversion))
-        cummulative12.append(numberofcasesdayzero)
-        infected.append(numberofcasesdayzero)
-    ratio.append(percentagenewversion*100 )
-    #walkingcummulative.append(1)
-    #if vaccination:
-    ry1x.append(Rnew1_)
-    ry2x.append(Rnew2_)
-    immeratio_=[]
-    immeratio_.append(1)
-
-    hospital.append(None)
-    ic.append(None)
-    ic_cumm.append(ic_dayzero)
-    hospital_cumm.append(hospital_dayzero)
-    walkingR.append((Rnew1_**(1-percentagenewversion))*(Rnew2_**(percentagenewversion)))
-    #showimmunization = True
-    if showimmunization:
-        totalimmune.append(totalimmunedayzero)
-
-    for t in range(1, NUMBEROFDAYS):
-        if showimmunization:
-            immeratio = (1-( (totalimmune[t-1]-totalimmune[0])/(totalpopulation-totalimmune[0])))
-            ry1_ = ry1x[0]*(immeratio**lambdaa)
-            ry2_ = ry2x[0]*(immeratio**lambdaa)
-            immeratio_.append(immeratio)
-        else:
-            ry1_ = ry1x[0]
-            ry2_ = ry2x[0]
-
-        if turning:
-            # Normally the turning won't be proportional but logistic
-            # https://miro.medium.com/max/1050/1*4rBxPap9aKEg_zoUZhGYMA.png
-            # https://towardsdatascience.com/infectious-disease-modelling-beyond-the-basic-sir-model-216369c584c4
-            # (R_0_start-R_0_end) / (1 + np.exp(-k*(-t+x0))) + R_0_end
-            # k = mate voor de snelheid
-            # x0 is turningpoint (midden van de lijn)
-
-            if (t>=(turningpoint) and t<(turningpoint+turningdays)):
-                if turningdays==0:
-                    ry1__ = ry1_  * changefactor
-                    ry2__ = ry2_  * changefactor
-                else:
-                    fraction =  (1-((t-(turningpoint))/turningdays))
-                    ry1__ =(ry1_  * changefactor) + ((ry1_ -(ry1_  * changefactor))*fraction)
-                    ry2__ =(ry2_  * changefactor) + ((ry2_ -(ry2_  * changefactor))*fraction)
-            elif t>=(turningpoint+turningdays):
-                ry1__ = ry1_  * changefactor
-                ry2__ = ry2_  * changefactor
-            else:
-                ry1__ = ry1_
-                ry2__ = ry2_
-        else:
-            ry1__ = ry1_
-            ry2__ = ry2_
-
-        if vaccination:
-            if t>7:
-                if t<(VACTIME+7) :
-                    ry1 = ry1__ * ((1-((t-7)/(VACTIME))))
-                    ry2 = ry2__ * ((1-((t-7)/(VACTIME))))
-                else:
-                    # vaccination is done, everybody is immune
-                    ry1 = ry1__ * 0.0000001
-                    ry2 = ry2__ * 0.0000001
-            else:
-                # it takes 7 days before vaccination works
-                ry1 = ry1__
-                ry2 = ry2__
-        else:
-            ry1 = ry1__
-            ry2 = ry2__
-
-        # prevent an [divide by zero]-error
-        if ry1 == 1:
-            ry1 = 1.000001
-        if ry2 == 1:
-            ry2 = 1.000001
-        if ry1 <= 0:
-            ry1 = 0.000001
-        if ry2 <= 0:
-            ry2 = 0.000001
-
-        thalf1 = Tg * math.log(0.5) / math.log(ry1)
-        thalf2 = Tg * math.log(0.5) / math.log(ry2)
-
-        pt1 = (positivetests1[t-1] * (0.5**(1/thalf1)))
-        pt2 = (positivetests2[t-1] * (0.5**(1/thalf2)))
-        positivetests1.append(pt1)
-        positivetests2.append(pt2)
-
-        # This formula works also and gives same results
-        # https://twitter.com/hk_nien/status/1350953807933558792
-        # positivetests1a.append(positivetests1a[t-1] * (ry1**(1/Tg)))
-        # positivetests2a.append(positivetests2a[t-1] * (ry2**(1/Tg)))
-        # positivetests12a.append(positivetests2a[t-1] * (ry2**(1/Tg))+ positivetests1[t-1]
-        #                                              * (ry1**(1/Tg)))
-
-        positivetests12.append(pt1+pt2)
-
-        if showcummulative:
-            cpt1 = (cummulative1[t-1]+  pt1)
-            cpt2 = (cummulative2[t-1]+  pt2 )
-            cpt12 =  (cummulative12[t-1]+ pt1 + pt2)
-
-            if cpt1>=totalpopulation:
-                cpt1 = totalpopulation
-            if cpt2>=totalpopulation:
-                cpt2 = totalpopulation
-            if cpt12>=totalpopulation:
-                cpt12 = totalpopulation
-
-            cummulative1.append   (cpt1)
-            cummulative2.append   (cpt2 )
-            cummulative12.append   (cpt12)
-
-        if (pt1+pt2)>0:
-            ratio_ =  ((pt2/(pt1+pt2)))
-        else:
-            ratio_ = 1
-
-        ratio.append   (100*ratio_)
-        positivetestsper100k.append((pt1+pt2)/25)
-
-        if showimmunization:
-            totalimmune_ = totalimmune[t-1]+((pt1+pt2)*testimmunefactor)
-            if totalimmune_>=totalpopulation:
-                totalimmune_ = totalpopulation
-            totalimmune.append(totalimmune_)
-
-        if showcummulative:
-            if t>averagedayssick:
-                infected.append (infected[t-1]+(((pt1+pt2))*testimmunefactor) -
-                                (( positivetests1[t-averagedayssick]+ positivetests2[t-averagedayssick])*testimmunefactor )
-                                )
-                suspectible.append(suspectible[t-1]-(((pt1+pt2))*testimmunefactor) )
-                recovered.append(recovered[t-1]+
-                            (( positivetests1[t-averagedayssick]+positivetests2[t-averagedayssick])
-                                * testimmunefactor ) )
-            else:
-                infected.append ( infected[t-1]+((pt1+pt2)*testimmunefactor) -
-                                (infected[0]/averagedayssick))
-                suspectible.append(suspectible[t-1]-(((pt1+pt2))*testimmunefactor) )
-                recovered.append(recovered[t-1]+  (infected[0]/averagedayssick))
-
-        ry1x.append(ry1)
-        ry2x.append(ry2)
-        walkingR.append((ry1**(1-ratio_))*(ry2**(ratio_)))
-        if t>=from_test_to_hospital:
-            hospital.append(positivetests12[t-from_test_to_hospital]*(percentage_test_hospital/100))
-        else:
-            hospital.append(None)
-        if t>=from_test_to_ic:
-            ic.append(positivetests12[t-from_test_to_ic]*(percentage_test_ic/100))
-        else:
-            ic.append(None)
-
-        delta_hospital = 0
-        delta_ic = 0
-
-        if t < hospital_days_stay:
-            delta_hospital += -1 * (hospital_dayzero / hospital_days_stay)
-        else:
-            hospital_temp = hospital[t-hospital_days_stay]
-            if hospital_temp == None:
-                hospital_temp = 0
-            delta_hospital += -1 * hospital_temp
-        if t> from_test_to_hospital:
-            delta_hospital +=(positivetests12[t-from_test_to_hospital]*(percentage_test_hospital/100))
-
-        if t < ic_days_stay:
-            delta_ic += -1 * (ic_dayzero / ic_days_stay)
-        else:
-            ic_temp = ic[t-ic_days_stay]
-            if ic_temp == None:
-                ic_temp = 0
-            delta_ic += -1 * ic_temp
-        if t> from_test_to_ic:
-            delta_ic +=(positivetests12[t-from_test_to_ic]*(percentage_test_ic/100))
-
-
-
-
-        hospital_cumm.append(hospital_cumm[t-1]+delta_hospital)
-        ic_cumm.append(ic_cumm[t-1]+delta_ic)
+    # Everything the figures show besides the simulation, part of the key of the rendered images
+    options = dict(numberofdays=NUMBEROFDAYS, today=b, datediff=datediff, startdate=a, Tg=Tg,
+                   label1=label1, label2=label2, numberofpositivetests=numberofpositivetests,
+                   percentage_test_ic=percentage_test_ic, percentage_test_hospital=percentage_test_hospital)
 
+    def show(name, key, series):
+        st.image(render(name, key, options, series))
 
 
     st.title('Positive COVID-tests in NL')
@@ -418,107 +517,16 @@ def main():
         st.markdown(disclaimerimm, unsafe_allow_html=True)
     #        'Inspired by <a href=\'https://twitter.com/RichardBurghout/status/1357044694149128200\' target=\'_blank\'>this tweet</a>.<br> '
 
-    def th2r(rz):
-        return int( Tg_ * math.log(0.5) / math.log(rz))
-
-    def r2th(th):
-        # HK is using  r = 2**(Tg_/th)
-        return int(10**((Tg_*mat.log(2))/th))
-
-    def getsecondax():
-        # get second y axis
-        # Door Han-Kwang Nienhuys - MIT License
-        # https://github.com/han-kwang/covid19/blob/master/nlcovidstats.py
-        ax2 = ax.twinx()
-        T2s = np.array([-2, -4,-7, -10, -11,-14, -21, -60, 9999, 60, 21, 14, 11,10, 7, 4, 2])
-        y2ticks = 2**(Tg_/T2s)
-        y2labels = [f'{t2 if t2 != 9999 else "∞"}' for t2 in T2s]
-        ax2.set_yticks(y2ticks)
-        ax2.set_yticklabels(y2labels)
-        ax2.set_ylim(*ax.get_ylim())
-        ax2.set_ylabel('Halverings-/verdubbelingstijd (dagen)')
-
-    def configgraph(titlex):
-        interval_ = int(numberofdays_ / 20)
-        plt.xlabel('date')
-        plt.xlim(x[0], x[-1])
-        todaylabel = "Today ("+ b + ")"
-        plt.axvline(x=x[0]+datediff, color='yellow', alpha=.6,linestyle='--',label = todaylabel)
-        # Add a grid
-        plt.grid(alpha=.4,linestyle='--')
-
-        #Add a Legend
-        fontP = FontProperties()
-        fontP.set_size('xx-small')
-        plt.legend(  loc='best', prop=fontP)
-        plt.title(titlex , fontsize=10)
-
-        # lay-out of the x axis
-        plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-        plt.gca().xaxis.set_major_locator(mdates.DayLocator(interval=interval_))
-        plt.gcf().autofmt_xdate()
-        plt.gca().set_title(titlex , fontsize=10)
-
-    # POS TESTS /day ################################
-    with _lock:
-        fig1, ax = plt.subplots()
-        plt.plot(x, positivetests1, label=label1,  linestyle='--')
-        plt.plot(x, positivetests2, label=label2,  linestyle='--')
-        plt.plot(x, positivetests12, label='Total')
-
-        # Add X and y Label and limits
-        plt.ylabel('positive tests per day')
-        plt.ylim(bottom = 0)
-
-        plt.fill_between(x, 0, 875, color='#f392bd',  label='waakzaam')
-        plt.fill_between(x, 876, 2500, color='#db5b94',  label='zorgelijk')
-        plt.fill_between(x, 2501, 6250, color='#bc2165',  label='ernstig')
-        plt.fill_between(x, 6251, 10000, color='#68032f', label='zeer ernstig')
-        plt.fill_between(x, 10000, 20000, color='grey', alpha=0.3, label='zeer zeer ernstig')
-
-        # Add a title
-        titlex = (
-            'Pos. tests per day.\n'
-            'Number of cases on '+ str(a) + ' = ' + str(numberofpositivetests) + '\n')
-        configgraph(titlex)
-        st.pyplot(fig1)
-
-    # # POS TESTS per 100k per week ################################
-    with _lock:
-        fig1d, ax = plt.subplots()
-        plt.plot(x, positivetestsper100k)
-        positivetestsper100k = []
-
-        # Add X and y Label and limits
-        plt.ylabel('new positive tests per 100k per week')
-        plt.ylim(bottom = 0)
-
-        # add horizontal lines and surfaces
-        plt.fill_between(x, 0, 35, color='yellow', alpha=0.3, label='waakzaam')
-        plt.fill_between(x, 36, 100, color='orange', alpha=0.3, label='zorgelijk')
-        plt.fill_between(x, 101, 250, color='red', alpha=0.3, label='ernstig')
-        plt.fill_between(x, 251, 500, color='purple', alpha=0.3, label='zeer ernstig')
-        plt.fill_between(x, 501, 1000, color='grey', alpha=0.3, label='zeer zeer ernstig')
-
-        plt.axhline(y=0, color='green', alpha=.6,linestyle='--' )
-        plt.axhline(y=35, color='yellow', alpha=.6,linestyle='--')
-        plt.axhline(y=100, color='orange', alpha=.6,linestyle='--')
-        plt.axhline(y=250, color='red', alpha=.6,linestyle='--')
-        plt.axhline(y=500, color='purple', alpha=.6,linestyle='--')
-
-        # Add a title
-        titlex = ( 'New pos. tests per 100k per week.\n'  )
-        configgraph(titlex)
-
-        st.pyplot(fig1d)
+    show("positive_tests", cases_key, cases_series)
+    show("per_100k", cases_key, cases_series)
 
 
     ####### SHOW TOTAL  CASES PER WEEK
     # inspired by https://twitter.com/steeph/status/1363865443467952128
     output = pd.DataFrame(
         {'date': x,
-        'First_variant': positivetests1,
-        'Second_variant': positivetests2
+        'First_variant': cases["positivetests1"],
+        'Second_variant': cases["positivetests2"]
         })
     #st.write(output)
 
@@ -537,255 +545,51 @@ def main():
 
 
     # with st.expander("Show bargraph per week - Attention - doesn't display well when there are two years involved and/or the weeks aren't complete. Weeks are Monday until Sunday"):
-    #     fig1x = plt.figure()
-    #     output.plot()
-    #     plt.legend(loc='best')
-    #     #st.pyplot(fig1x)
-    #     #st.write(fig1x)
-    #     titlex="Number of casees per week"
-    #     configgraph(titlex)
-
     #     st.bar_chart(output)
 
 
-    positivetests1 = []
-    positivetests2 = []
-    positivetest12 = []
-
-
     # Show cummulative cases
     if showcummulative:
-        with _lock:
-            fig1e, ax = plt.subplots()
-            plt.plot(x,cummulative1, label='Cummulative pos. test first variant',  linestyle='--')
-            plt.plot(x,cummulative2, label='Cummulative pos. test second variant',  linestyle='--')
-            plt.plot(x,cummulative12, label='Cummulative pos. test TOTAL',)
-
-            cummulative1 = []
-            cummulative2 = []
-            cummulative12 = []
-            # Add X and y Label and limits
-
-            plt.ylabel('Total positive tests')
-            plt.ylim(bottom = 0)
-
-            # Add a title
-            titlex = ('Cummulative positive tests\nNo recovery/death in this graph')
-
-            configgraph(titlex)
-
-            plt.axhline(y=1, color='yellow', alpha=.6,linestyle='--')
-            st.pyplot(fig1e)
-
-        # Infected
-        with _lock:
-            fig1i, ax = plt.subplots()
-            plt.plot(x, suspectible, label='Suspectible',  linestyle='--')
-            plt.plot(x, infected, label='Infected',  linestyle='--')
-            plt.plot(x, recovered, label='Recovered',  linestyle='--')
-            infected = []
-
-            # Add  y Label and limits
-            plt.ylabel('No of cases')
-            plt.ylim(bottom = 0)
-
-            # Add a title
-            titlex = ('Suspectible - Infected - Recovered.\nBased on positive tests.\n'
-                    '(test/immunityfactor is taken in account)')
-            configgraph(titlex)
-
-            st.pyplot(fig1i)
-    # Show the percentage new variant
-    with _lock:
-        fig1f, ax = plt.subplots()
-        plt.plot(x, ratio, label='Ratio',  linestyle='--')
-        ratio = []
-
-        # Add  y Label and limits
-        plt.ylabel('ratio')
-        plt.ylim(bottom = 0)
-
-        # Add a title
-        titlex = ('Percentage new variant.\n')
-        configgraph(titlex)
-        plt.axhline(y=50, color='yellow', alpha=.6,linestyle='--')
-        st.pyplot(fig1f)
-
-
-    # Show the R number in time
-    with _lock:
-        fig1f, ax = plt.subplots()
-        plt.plot(x, walkingR, label='Combined R number in time',  linestyle='--')
-        plt.plot(x, ry1x, label='Old variant',  linestyle='--')
-        plt.plot(x, ry2x, label='New variant',  linestyle='--')
-
-        walkingR = []
-
-        # Add X and y Label and limits
-        plt.ylabel('R-number')
-        #plt.ylim(bottom = 0)
-
-        # Add a title
-        titlex = ('R number in time.\n')
-        plt.title(titlex , fontsize=10)
-        configgraph(titlex)
-        plt.axhline(y=1, color='yellow', alpha=.6,linestyle='--')
-        getsecondax()
-        #secax = ax.secondary_yaxis('right', functions=(r2th,th2r))
-        #secax.set_ylabel('Thalf')
-        st.pyplot(fig1f)
-
-    # Ziekenhuis opnames
-    with _lock:
-        fig1g, ax = plt.subplots()
-        plt.plot(x, hospital, label='Ziekenhuis per dag')
-        plt.plot(x, ic, label='IC per dag')
-        # Add X and y Label and limits
-
-        plt.ylabel('Ziekenhuis- en IC-opnames per day')
-        plt.ylim(bottom = 0)
-        plt.axhline(y=0, color='green', alpha=.6,linestyle='--' )
-        plt.axhline(y=12, color='yellow', alpha=.6,linestyle='--')
-        plt.axhline(y=40, color='orange', alpha=.6,linestyle='--')
-        plt.axhline(y=80, color='red', alpha=.6,linestyle='--')
-        # https://twitter.com/YorickB/status/1369253144014782466/photo/1
-        # Add a title
-        titlex = ('Ziekenhuis ('+str(percentage_test_hospital)+ ' %) en IC ('+str(percentage_test_ic)+' %) opnames per day,\n7 dgn vertraging')
-        configgraph(titlex)
-        st.pyplot(fig1g)
-
-    ry1x = []
-    ry2x = []
-    hospital = []
-    ic = []
+        show("cummulative", cases_key, cases_series)
+        show("infected", cases_key, cases_series)
+    show("ratio", cases_key, cases_series)
+    show("r_number", cases_key, cases_series)
+    show("admissions", cases_key, cases_series)
     ################################################
 
-    # Ziekenhuis bezetting
-    with _lock:
-        fig1g, ax = plt.subplots()
-        plt.plot(x, hospital_cumm, label='Ziekenhuis bezetting per dag')
-        plt.plot(x, ic_cumm, label='IC bezetting per dag')
-        # Add X and y Label and limits
-
-        plt.ylabel('Ziekenhuis- en IC-bezetting per day')
-        plt.ylim(bottom = 0)
-        plt.axhline(y=1300, color='blue', alpha=.6,linestyle='--' )
-        plt.axhline(y=750, color='yellow', alpha=.6,linestyle='--')
-        plt.axhline(y=1000, color='orange', alpha=.6,linestyle='--')
-        plt.axhline(y=1500, color='red', alpha=.6,linestyle='--')
-
-        # Add a title
-        titlex = (f'Ziekenhuis ({percentage_test_hospital}%) en IC ({percentage_test_ic}%) bezetting per day,ZEER vereenvoudigd')
-        configgraph(titlex)
-        st.pyplot(fig1g)
-        st.write(f"Value for hospital occupation t=21   : {int((hospital_cumm[21]))}")
-        st.write(f"Value for hospital occupation t=35   : {int((hospital_cumm[35]))}")
-        st.write(f"Maximum value for hospital occupation : {int(max(hospital_cumm))}")
-
-        st.write(f"Value for IC occupation t=21         : {int((ic_cumm[21]))}")
-        st.write(f"Value for IC occupation t=35         : {int((ic_cumm[35]))}")
-        st.write(f"Maximum value for IC occupation       : {int(max(ic_cumm))}")
-    ry1x = []
-    ry2x = []
-    hospital_cumm = []
-    ic_cumm = []
+    show("occupation", cases_key, cases_series)
+    st.write(f"Value for hospital occupation t=21   : {int((hospital_cumm[21]))}")
+    st.write(f"Value for hospital occupation t=35   : {int((hospital_cumm[35]))}")
+    st.write(f"Maximum value for hospital occupation : {int(max(hospital_cumm))}")
+
+    st.write(f"Value for IC occupation t=21         : {int((ic_cumm[21]))}")
+    st.write(f"Value for IC occupation t=35         : {int((ic_cumm[35]))}")
+    st.write(f"Maximum value for IC occupation       : {int(max(ic_cumm))}")
     #########################
     if showSIR:
 
         with st.expander("Show classical SIR-graphs"):
 
-
-
-            # https://scipython.com/book/chapter-8-scipy/additional-examples/the-sir-epidemic-model/
-
             # Total population, N.
-            #N = int(input("Total population, N "))
-            #if N == 0 :
             N = int(totalpopulation)
 
             # Initial number of infected and recovered individuals, I0 and R0.
             I0, R0 = int(numberofcasesdayz), totalimmunedayzero
-            # Everyone else, S0, is susceptible to infection initially.
-            S0 = N - I0 -  R0
-            C0 = I0
             days = NUMBEROFDAYS
 
-            # Contact rate, beta, and mean recovery rate, gamma, (in 1/days).
-            #beta, gamma = 0.2, 1./10
-            ##beta = float(input("Contact rate - beta [0-1] "))
-            #gamma = 1/int(input("Mean recovery rate in days - 1/gamma  "))
-
             # Gamma is 1/serial interval
             # https://wwwnc.cdc.gov/eid/article/26/6/20-0357_article
-
-            gamma = 1./Tg_
             Rstart = Rnew2_
-            #beta = Rstart*gamma
-            beta = Rstart*gamma/(S0/N)
-            #beta, gamma = 0.2, 1./20
-
-            # reproductionrate = beta / gamma
 
             # β describes the effective contact rate of the disease:
             # an infected individual comes into contact with βN other
             # individuals per unit time (of which the fraction that are
             # susceptible to contracting the disease is S/N).
             # 1/gamma is recovery rate in days
-
-            # A grid of time points (in days)
-            t = np.linspace(0, days, days)
-
-            # The SIR model differential equations.
-            # https://scipython.com/book/chapter-8-scipy/additional-examples/the-sir-epidemic-model/
-            def deriv(y, t, N, beta, gamma):
-                S, I, C, R = y
-                dSdt = -beta * S * I / N   # aantal zieke mensen x aantal gezonde mensen x beta
-                dIdt = beta * S * I / N - gamma * I
-                dCdt = beta * S * I / N
-                dRdt = gamma * I
-
-                #print (dIdt)
-
-                # (n2/n1)^(Tg/t)
-                return dSdt, dIdt, dRdt, dCdt
-
-            # Initial conditions vector
-            y0 = S0, I0, C0, R0
-            # Integrate the SIR equations over the time grid, t.
-            ret = odeint(deriv, y0, t, args=(N, beta, gamma))
-            S, I, C, R  = ret.T
-
-
-            Tg = Tg_
-            d = 1
-            repr=[]
-            repr.append(Rstart)
-            repr_c=[]
-            repr_i=[]
-            repr_c.append(None)
-            repr_i.append(None)
-            t = np.linspace(0, days, days)
-            #print (I)
-            Cnew=[]
-            #Cnew.append(int(numberofcasesdayz))
-            Cnew.append(None)
-            for time in range(1,days):
-                Cnew.append(C[time]-C[time-1])
-
-                #if Cnew[time-1] == None:
-                if time == 1:
-                    repr_ = None
-                    repr_c_ = None
-                    repr_i_ = None
-                else:
-                    #repr_= (C[time]/C[time-1])**(Tg/d)
-                    repr_= (Cnew[time]/Cnew[time-1])**(Tg/d)
-                    repr_c_= (C[time]/C[time-1])**(Tg/d)
-                    repr_i_= (I[time]/I[time-1])**(Tg/d)
-                #repr_= (I[time]/I[time-1])
-                repr.append(repr_)
-                repr_c.append(repr_c_)
-                repr_i.append(repr_i_)
+            sir = simulate_sir(days, Rstart, Tg, N, I0, R0)
+            sir_key = ("sir", days, Rstart, Tg, N, I0, R0)
+            sir_series = dict(sir, x=x)
+            beta, gamma, C = float(sir["beta"]), float(sir["gamma"]), sir["C"]
 
             disclaimerSIR= ('<div class=\"infobox\"><h1>Classical SIR-graphs</h1>'
                             '<p>These graphs are based on classical SIR models.'
@@ -800,74 +604,15 @@ def main():
 
             st.markdown(disclaimerSIR, unsafe_allow_html=True)
 
-            # Plot the data on three separate curves for S(t), I(t) and R(t)
-            fig2a = plt.figure(facecolor='w')
-            #ax = fig2a.add_subplot(111, facecolor='#dddddd', axisbelow=True)
-            ax = fig2a.add_subplot(111, axisbelow=True)
-            ax.plot(x, S, 'b', alpha=0.5, lw=2, label='Susceptible')
-            ax.plot(x, I, 'r', alpha=0.5, lw=2, label='Infected')
-            ax.plot(x, Cnew, 'yellow', alpha=0.5, lw=2, label='New Cases')
-            ax.plot(x, R, 'g', alpha=0.5, lw=2, label='Recovered with immunity')
-            #ax.plot(t, repr, 'yellow', alpha=0.5, lw=2, label='R getal')
-            ax.set_xlabel('Time (days)')
-            ax.set_ylabel('Number')
-            #ax.set_ylim(0,1.2)
-            ax.yaxis.set_tick_params(length=0)
-            ax.xaxis.set_tick_params(length=0)
-            #ax.grid(b=True, which='major', c='w', lw=2, ls='-')
-            #legend = ax.legend()
-            #legend.get_frame().set_alpha(0.5)
-            #for spine in ('top', 'right', 'bottom', 'left'):
-            #    ax.spines[spine].set_visible(False)
-            titlex = 'SIR based on cases first day'
-            configgraph(titlex)
-            plt.show()
-            st.pyplot(fig2a)
-
-
-            # New cases
-            fig2c = plt.figure(facecolor='w')
-            ax = fig2c.add_subplot(111,  axisbelow=True)
-            #ax.plot(t, C, 'green', alpha=0.5, lw=2, label='Cases')
-            ax.plot(x, Cnew, 'y', alpha=0.5, lw=2, label='New Cases')
-            #ax.plot(t, repr, 'yellow', alpha=0.5, lw=2, label='R getal')
-            ax.set_xlabel('Time (days)')
-            ax.set_ylabel('Number')
-            #ax.set_ylim(0,1.2)
-            ax.yaxis.set_tick_params(length=0)
-            ax.xaxis.set_tick_params(length=0)
-            # ax.grid(b=True, which='major', c='w', lw=2, ls='-')
-            # legend = ax.legend()
-            # legend.get_frame().set_alpha(0.5)
-            # for spine in ('top', 'right', 'bottom', 'left'):
-            #     ax.spines[spine].set_visible(False)
-            titlex = 'New cases'
-            configgraph(titlex)
-            plt.show()
-            st.pyplot(fig2c)
-
-            # Gliding R number
-            fig2b = plt.figure(facecolor='w')
-            ax = fig2b.add_subplot(111,  axisbelow=True)
-            ax.plot(x, repr, 'b', alpha=0.5, lw=2, label='R getal_ based on Cnew')
-            #ax.plot(t, repr_i, 'b', alpha=0.5, lw=2, label='R getal based on I')
-            #ax.plot(t, repr_c, 'g', alpha=0.5, lw=2, label='R getal based on C')
-            ax.set_xlabel('Time (days)')
-            ax.set_ylabel('R getal')
-            #ax.set_ylim(0,2)
-            ax.axhline(y=1, color='yellow', alpha=.6,linestyle='--')
-            # ax.grid(b=True, which='major', c='w', lw=2, ls='-')
-            # legend = ax.legend()
-            titlex = "Gliding R-number"
-            configgraph(titlex)
-            plt.show()
-            st.pyplot(fig2b)
+            show("sir", sir_key, sir_series)
+            show("sir_band", sir_key, sir_series)
+            show("new_cases", sir_key, sir_series)
+            show("gliding_r", sir_key, sir_series)
 
             st.write  ("attack rate growth model : " +        str(round(100*((recovered[days-1])/N),2))+ " %")
             st.write  ("attack rate classical SIR model : " + str(round(100*((C[days-1])        /N),2))+ " %")
             st.markdown ("Theoretical herd immunity treshhold (HIT) (1 - [1/"+str(Rstart)+"]<sup>1/"+ str(lambdaa)+ "</sup>) : " + str(round(100*(1-((1/Rstart)**(1/lambdaa))),2))+ " % = " + str(round(N*(1-((1/Rstart)**(1/lambdaa))),0))+ " persons", unsafe_allow_html=True)
             st.write ("Attack rate = final size of the epidemic (FSE) ")
-            repr=[]
 
     #####################################################
 
@@ -1,92 +1,104 @@
-import numpy as np 
-import pandas as pd 
-import matplotlib.pyplot as plt
-
 import warnings
 warnings.filterwarnings("ignore")
-plt.style.use('fivethirtyeight')
-import pandas as pd
 
-import pandas as pd
 import numpy as np
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Dense
-from tensorflow.keras.layers import LSTM
-from tensorflow.keras.layers import Dropout
-from tensorflow.keras.layers import *
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.metrics import mean_squared_error
+import pandas as pd
 
 import ticker_manager
+from feature_pipeline import FeaturePipeline
+from windowing import sliding_windows
 
 
 def preproccess(training_set, predictor_col_ind, steps=15, sc=None):
-    # Feature 
-    if sc == None:
-        sc = MinMaxScaler(feature_range = (0, 1))
-        sc_target = MinMaxScaler(feature_range = (0, 1))
-        #print(training_set.iloc[:,predictor_col_ind])
-        sc_target.fit(training_set.values[:,predictor_col_ind].reshape(-1, 1))
-        training_set_scaled = sc.fit_transform(training_set)
-    else:
-        training_set_scaled = sc.transform(training_set)
-    # Creating a data structure with 60 time-steps and 1 output
-    X_train = []
-    y_train = []
-    for i in range(steps, len(training_set)):
-        X_train.append(training_set_scaled[i-steps:i,:])
-        
-        y_train.append(training_set_scaled[i,predictor_col_ind])
-    X_train, y_train = np.array(X_train), np.array(y_train)
-    X_train = np.reshape(X_train, (X_train.shape[0], X_train.shape[1], X_train.shape[2]))
+    """Fit the feature pipeline on the training set (unless a fitted one is passed as sc)
+    and return the windows, the targets and the pipeline."""
+    pipeline = sc if sc is not None else FeaturePipeline(predictor_col_ind, steps=steps).fit(training_set)
+    # Creating a data structure with `steps` time-steps and 1 output, as strided views
+    X_train, y_train = pipeline.training_windows(training_set)
 
-    return X_train, y_train, sc, sc_target
+    return X_train, y_train, pipeline
 
 def preproccess_inference(test_data, steps=15, sc=None):
-    # Feature 
-    if sc == None:
-        sc = MinMaxScaler(feature_range = (0, 1))
-        training_set_scaled = sc.fit_transform(test_data)
-    else:
-        training_set_scaled = sc.fit_transform(test_data)
-    # Creating a data structure with 60 time-steps and 1 output
-    X_train = []
-    for i in range(steps, len(test_data)):
-        X_train.append(training_set_scaled[i-steps:i,:])
-    X_train = np.array(X_train)
-    X_train = np.reshape(X_train, (X_train.shape[0], X_train.shape[1], X_train.shape[2]))
-
-    return X_train,
-
-#@st.experimental_memo
-def model_build_and_fit(X_train, y_train):
+    """Windows of test_data scaled with the fitted pipeline (or scaler) from training, never refitted.
+    Without one a pipeline is fitted on test_data itself."""
+    if sc is None:
+        sc = FeaturePipeline(0, steps=steps).fit(test_data)
+    if isinstance(sc, FeaturePipeline):
+        return sc.windows(test_data)
+    # Creating a data structure with `steps` time-steps, as strided views
+    return sliding_windows(sc.transform(test_data), steps)
+
+def make_dataset(data_scaled, predictor_col_ind, steps=15, batch_size=32, shuffle=True, seed=None):
+    """Window, batch, shuffle and prefetch straight from the scaled price matrix.
+
+    Only the window start indices are shuffled, the windows themselves are cut out
+    batch by batch, so peak memory scales with batch_size instead of the number of windows.
+    """
+    import tensorflow as tf
+    data_scaled = np.asarray(data_scaled, dtype=np.float32)
+    # The window starting at row i covers rows i..i+steps-1 and predicts row i+steps
+    dataset = tf.keras.utils.timeseries_dataset_from_array(
+        data_scaled[:-1], data_scaled[steps:, predictor_col_ind], sequence_length=steps,
+        batch_size=batch_size, shuffle=shuffle, seed=seed)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+def preproccess_dataset(training_set, predictor_col_ind, steps=15, batch_size=32, shuffle=True):
+    """Like preproccess, but returns a tf.data.Dataset of (X, y) batches instead of the arrays"""
+    pipeline = FeaturePipeline(predictor_col_ind, steps=steps).fit(training_set)
+    dataset = make_dataset(pipeline.transform(training_set), pipeline.target_ind, steps=steps,
+                           batch_size=batch_size, shuffle=shuffle)
+    return dataset, pipeline
+
+# Everything that defines the network, the model registry hashes it so a change retrains
+ARCHITECTURE = {
+    "lstm_units": (50, 50, 50, 50),
+    "dropout": 0.2,
+    "optimizer": "adam",
+    "loss": "mean_squared_error",
+    "epochs": 100,
+    "batch_size": 32,
+}
+
+def model_build(input_shape, architecture=ARCHITECTURE, n_outputs=1):
+    """Build the stacked LSTM, with n_outputs > 1 it forecasts several tickers' close at once"""
+    from tensorflow.keras.layers import LSTM, Dense, Dropout
+    from tensorflow.keras.models import Sequential
     model = Sequential()
-    #Adding the first LSTM layer and some Dropout regularisation
-    model.add(LSTM(units = 50, return_sequences = True, input_shape = (X_train.shape[1], X_train.shape[2])))
-    model.add(Dropout(0.2))
-    # Adding a second LSTM layer and some Dropout regularisation
-    model.add(LSTM(units = 50, return_sequences = True))
-    model.add(Dropout(0.2))
-    # Adding a third LSTM layer and some Dropout regularisation
-    model.add(LSTM(units = 50, return_sequences = True))
-    model.add(Dropout(0.2))
-    # Adding a fourth LSTM layer and some Dropout regularisation
-    model.add(LSTM(units = 50))
-    model.add(Dropout(0.2))
+    units = architecture["lstm_units"]
+    for i, n_units in enumerate(units):
+        # Stacked LSTM layers with some Dropout regularisation, only the last one returns a single vector
+        if i == 0:
+            model.add(LSTM(units = n_units, return_sequences = len(units) > 1, input_shape = input_shape))
+        else:
+            model.add(LSTM(units = n_units, return_sequences = i < len(units) - 1))
+        model.add(Dropout(architecture["dropout"]))
     # Adding the output layer
-    model.add(Dense(units = 1))
+    model.add(Dense(units = n_outputs))
 
     # Compiling the RNN
-    model.compile(optimizer = 'adam', loss = 'mean_squared_error')
+    model.compile(optimizer = architecture["optimizer"], loss = architecture["loss"])
+    return model
 
+#@st.experimental_memo
+def model_build_and_fit(X_train, y_train=None, epochs=ARCHITECTURE["epochs"], batch_size=ARCHITECTURE["batch_size"]):
+    """Build and fit the LSTM, X_train is either an array of windows or a dataset from make_dataset"""
+    import tensorflow as tf
+    if isinstance(X_train, tf.data.Dataset):
+        model = model_build(tuple(X_train.element_spec[0].shape[1:]))
+        # Fitting the RNN to the batches of the input pipeline
+        model.fit(X_train, epochs = epochs)
+        return model
+
+    model = model_build((X_train.shape[1], X_train.shape[2]))
     # Fitting the RNN to the Training set
-    model.fit(X_train, y_train, epochs = 100, batch_size = 32)
+    model.fit(X_train, y_train, epochs = epochs, batch_size = batch_size)
     return model
 
 
     
 
 if __name__ == '__main__':
+    import panel
     import yfinanceScraper
     stepsize = 30
     number_of_days = 800
@@ -97,16 +109,10 @@ if __name__ == '__main__':
     SCRAPER_SP500 = yfinanceScraper.Scraper(ticker="^GSPC", n_days=number_of_days)
     SCRAPER_AAPL = yfinanceScraper.Scraper(ticker="AAPL", n_days=number_of_days)"""
 
-    df = None
-    for ticker in ticker_manager.Ticker:
-        data = yfinanceScraper.Scraper(ticker=ticker.value, n_days=number_of_days).historic_data
-        data.columns = [ticker.name + "."+ x for x in data.columns]
-        if df is None:
-            df = data
-            #print(df)
-        else:
-            df = pd.concat((df, data), axis=1)
-        #print(df)
+    frames = yfinanceScraper.Scraper.bulk_history([ticker.value for ticker in ticker_manager.Ticker],
+                                                   n_days=number_of_days)
+    df = panel.build_panel({ticker.name: frames[ticker.value] for ticker in ticker_manager.Ticker
+                            if ticker.value in frames}).to_frame()
 
     
     print(df)
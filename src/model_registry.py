@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+import bar_store
+
+DEFAULT_MODEL_DIR = os.path.join(bar_store.DEFAULT_CACHE_DIR, "models")
+# Bumped when the layout of the saved state changes, older entries are then never loaded.
+# 3: every state holds the last_index of the frame it was trained on (see data_state)
+# 4: the app's states hold the training MSE as "mse"
+# 5: every entry is a set of version directories with a "current" pointer
+STATE_FORMAT = 5
+# Loaded models kept in memory, the least recently used one is dropped beyond this
+MAX_LOADED = 16
+# Versions kept on disk per entry, a reader may still be loading the previous one
+KEEP_VERSIONS = 2
+
+_default_registry = None
+
+
+def default_registry():
+    """Return the process wide ModelRegistry in DEFAULT_MODEL_DIR, its loaded models outlive reruns"""
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = ModelRegistry()
+    return _default_registry
+
+
+def model_key(tickers, predictor, stepsize, architecture):
+    """Hash of everything that defines a model except the data it is trained on"""
+    description = json.dumps({
+        "tickers": list(tickers),
+        "predictor": predictor,
+        "stepsize": stepsize,
+        "architecture": architecture,
+        "state_format": STATE_FORMAT,
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(description.encode()).hexdigest()[:16]
+
+
+def data_fingerprint(frame):
+    """Hash of the values, index and column names of a training frame"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([str(c) for c in frame.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def data_state(state, frame):
+    """The state plus last_index, the index of the last row of the training frame.
+
+    retrain.incremental_retrain finds the rows added since from it, so every entry saved
+    for a frame carries it, whether get_or_train or incremental_retrain trained the model.
+    """
+    return dict(state, last_index=frame.index[-1] if len(frame) else None)
+
+
+class ModelRegistry:
+    """Fitted models on disk, keyed on the model definition and the training data.
+
+    Every entry is a directory <model key>/<data fingerprint> holding version directories
+    with the saved Keras model and a pickle of the fitted state (e.g. the feature pipeline),
+    plus a "current" file naming the version to load. A save writes a new version and then
+    swaps the pointer, so a reader always finds a complete model. Up to max_loaded models
+    are also kept in memory, so a repeated request in the same process does not touch the disk.
+    """
+    def __init__(self, root=DEFAULT_MODEL_DIR, max_loaded=MAX_LOADED):
+        self.root = root
+        self.max_loaded = max_loaded
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def entry_dir(self, key, fingerprint):
+        return os.path.join(self.root, key, fingerprint)
+
+    def current(self, key, fingerprint):
+        """The directory of the current version of the entry, or None if it was never saved"""
+        try:
+            with open(os.path.join(self.entry_dir(key, fingerprint), "current")) as f:
+                return os.path.join(self.entry_dir(key, fingerprint), f.read().strip())
+        except FileNotFoundError:
+            return None
+
+    def _remember(self, key, fingerprint, entry):
+        with self._lock:
+            self._loaded[(key, fingerprint)] = entry
+            self._loaded.move_to_end((key, fingerprint))
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+
+    def load(self, key, fingerprint):
+        """Return (model, state) for the entry, or None if it was never saved"""
+        with self._lock:
+            if (key, fingerprint) in self._loaded:
+                self._loaded.move_to_end((key, fingerprint))
+                return self._loaded[(key, fingerprint)]
+        path = self.current(key, fingerprint)
+        if path is None:
+            return None
+        from tensorflow import keras
+        model = keras.models.load_model(os.path.join(path, "model.keras"))
+        with open(os.path.join(path, "state.pkl"), "rb") as f:
+            state = pickle.load(f)
+        self._remember(key, fingerprint, (model, state))
+        return model, state
+
+    def save(self, key, fingerprint, model, state):
+        """Save a fitted model and its state as a new version, and mark it as the latest of its key"""
+        path = self.entry_dir(key, fingerprint)
+        os.makedirs(path, exist_ok=True)
+        # Build the version next to its final place, then point the entry at it
+        tmp_path = tempfile.mkdtemp(dir=path, prefix=".tmp-")
+        model.save(os.path.join(tmp_path, "model.keras"))
+        with open(os.path.join(tmp_path, "state.pkl"), "wb") as f:
+            pickle.dump(state, f)
+        version = f"{time.time_ns()}-{os.getpid()}"
+        os.rename(tmp_path, os.path.join(path, version))
+        _write_atomic(os.path.join(path, "current"), version)
+        _write_atomic(os.path.join(self.root, key, "latest"), fingerprint)
+        self.prune(key, fingerprint, keep=version)
+        self._remember(key, fingerprint, (model, state))
+
+    def prune(self, key, fingerprint, keep):
+        """Remove all but the newest KEEP_VERSIONS versions of an entry (and never `keep`)"""
+        path = self.entry_dir(key, fingerprint)
+        versions = sorted((v for v in os.listdir(path) if not v.startswith(".") and v != "current"),
+                          key=lambda v: int(v.split("-")[0]))
+        for version in versions[:-KEEP_VERSIONS]:
+            if version != keep:
+                shutil.rmtree(os.path.join(path, version), ignore_errors=True)
+
+    def latest(self, key):
+        """Return the fingerprint of the last model saved for key, or None"""
+        try:
+            with open(os.path.join(self.root, key, "latest")) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def get_or_train(self, key, frame, train):
+        """Return (model, state, hit) for the training frame, only calling train() on a miss.
+
+        Parameters:
+        key (str): From model_key
+        frame (DataFrame): The training data
+        train (callable): train() -> (model, state)
+        """
+        fingerprint = data_fingerprint(frame)
+        entry = self.load(key, fingerprint)
+        if entry is not None:
+            return entry[0], entry[1], True
+        model, state = train()
+        state = data_state(state, frame)
+        self.save(key, fingerprint, model, state)
+        return model, state, False
+
+
+def _write_atomic(path, text):
+    """Replace the file at path with text, readers see either the old or the new content"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
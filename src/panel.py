@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+FIELDS = ("open", "high", "low", "close", "volume")
+
+
+def trading_dates(data):
+    """The naive calendar dates (datetime64[D]) of a Scraper style frame with a datetime column
+    or date index, or of bars.Bars"""
+    if hasattr(data, "day"):
+        return np.asarray(data.day).astype("datetime64[D]")
+    dates = pd.DatetimeIndex(data["datetime"] if "datetime" in data.columns else data.index)
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+    return dates.to_numpy().astype("datetime64[D]")
+
+
+class Panel:
+    """Prices of many tickers aligned on one trading calendar.
+
+    values is a contiguous float32 array shaped (dates, tickers, fields).
+    """
+    def __init__(self, values, dates, tickers, fields):
+        self.values = values
+        self.dates = dates
+        self.tickers = list(tickers)
+        self.fields = tuple(fields)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def field(self, name):
+        """(dates, tickers) view of one field"""
+        return self.values[:, :, self.fields.index(name)]
+
+    def ticker(self, name):
+        """(dates, fields) view of one ticker"""
+        return self.values[:, self.tickers.index(name), :]
+
+    def to_frame(self):
+        """Wide frame with TICKER.field columns, the layout the model preprocessing uses"""
+        columns = [f"{ticker}.{field}" for ticker in self.tickers for field in self.fields]
+        return pd.DataFrame(self.values.reshape(len(self.dates), -1), index=self.dates, columns=columns)
+
+
+def forward_fill(values):
+    """Forward fill nans along axis 0 without a Python loop over the rows"""
+    valid = ~np.isnan(values)
+    rows = np.arange(values.shape[0]).reshape((-1,) + (1,) * (values.ndim - 1))
+    last_valid = np.maximum.accumulate(np.where(valid, rows, 0), axis=0)
+    filled = np.take_along_axis(values, last_valid, axis=0)
+    # Rows before the first valid value stay nan
+    filled[~np.maximum.accumulate(valid, axis=0)] = np.nan
+    return filled
+
+
+def build_panel(frames, fields=FIELDS, calendar=None, fill="ffill"):
+    """Align many tickers on one trading calendar in a single allocation.
+
+    The source frames are only read, never modified.
+
+    Parameters:
+    frames (dict): ticker name -> Scraper style history frame or bars.Bars
+    fields (tuple): Columns to take from every frame
+    calendar (DatetimeIndex): Dates of the panel, the union of all trading dates by default
+    fill (str): "ffill" to carry the last price over days a market was closed,
+        "zero" to fill them with 0 like the old pd.concat/fillna code, None to keep nan
+
+    Returns a Panel
+    """
+    dates = {name: trading_dates(data) for name, data in frames.items()}
+    if calendar is None:
+        calendar = np.unique(np.concatenate(list(dates.values())))
+    else:
+        calendar = trading_dates(pd.DataFrame(index=calendar))
+
+    values = np.full((len(calendar), len(frames), len(fields)), np.nan, dtype=np.float32)
+    for j, (name, data) in enumerate(frames.items()):
+        position = np.searchsorted(calendar, dates[name])
+        keep = position < len(calendar)
+        keep[keep] = calendar[position[keep]] == dates[name][keep]
+        columns = np.column_stack([np.asarray(data[field], dtype=np.float32) for field in fields])
+        values[position[keep], j, :] = columns[keep]
+
+    if fill == "ffill":
+        values = forward_fill(values)
+    elif fill == "zero":
+        np.nan_to_num(values, copy=False, nan=0.0)
+    return Panel(np.ascontiguousarray(values), pd.DatetimeIndex(calendar.astype("datetime64[ns]")),
+                 frames.keys(), fields)
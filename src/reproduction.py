@@ -0,0 +1,76 @@
+import numpy as np
+
+
+def _values(series, axis):
+    """Float array with time on the last axis, masked entries as nan"""
+    values = np.ma.filled(np.ma.asarray(series, dtype=np.float64), np.nan)
+    return np.moveaxis(values, axis, -1)
+
+
+def _result(values, valid, axis):
+    """Masked array of values where valid, time moved back to `axis`"""
+    result = np.ma.masked_array(np.where(valid, values, np.nan), mask=~valid)
+    return np.moveaxis(result, -1, axis)
+
+
+def _lagged(values, lag):
+    """values[..., t - lag] at position t, nan for the first lag steps"""
+    lagged = np.full_like(values, np.nan)
+    if lag < values.shape[-1]:
+        lagged[..., lag:] = values[..., :values.shape[-1] - lag]
+    return lagged
+
+
+def incidence(cumulative, axis=-1):
+    """New cases per step of a cumulative series, the first step is masked"""
+    cumulative = _values(cumulative, axis)
+    new_cases = cumulative - _lagged(cumulative, 1)
+    return _result(new_cases, np.isfinite(new_cases), axis)
+
+
+def growth_ratio(series, Tg, d=1, axis=-1):
+    """(x[t] / x[t - d]) ** (Tg / d), the reproduction number implied by growth over d steps.
+
+    Works on any positive series: incidence, active cases or prices (e.g. Scraper(...).bars.close).
+    Steps without a valid earlier value, or where either value is not positive, are masked.
+
+    Parameters:
+    series (array): One series or a batch of them, time along `axis`, masked values are skipped
+    Tg (float): Generation time in steps, or an array broadcasting against the batch axes
+    d (int): Number of steps the growth is measured over
+    """
+    values = _values(series, axis)
+    previous = _lagged(values, d)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        valid = (values > 0) & (previous > 0)
+        ratio = (values / np.where(valid, previous, 1.0)) ** (np.asarray(Tg, dtype=np.float64)[..., np.newaxis] / d)
+    return _result(ratio, valid & np.isfinite(ratio), axis)
+
+
+def rolling_mean(series, window, axis=-1):
+    """Trailing mean over `window` steps ignoring masked values, masked until the window is full
+    or when it holds no valid value. Uses cumulative sums, no loop over the steps."""
+    values = _values(series, axis)
+    valid = np.isfinite(values)
+    zero = np.zeros(values.shape[:-1] + (1,))
+    sums = np.concatenate([zero, np.cumsum(np.where(valid, values, 0.0), axis=-1)], axis=-1)
+    counts = np.concatenate([zero, np.cumsum(valid, axis=-1)], axis=-1)
+    window_count = np.full(values.shape, 0.0)
+    window_sum = np.full(values.shape, np.nan)
+    window_sum[..., window - 1:] = sums[..., window:] - sums[..., :-window]
+    window_count[..., window - 1:] = counts[..., window:] - counts[..., :-window]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = window_sum / window_count
+    return _result(mean, window_count > 0, axis)
+
+
+def instantaneous_r(cumulative, Tg, d=1, window=None, axis=-1):
+    """Instantaneous reproduction number from a cumulative case series.
+
+    The growth_ratio of the incidence, smoothed with a trailing rolling_mean of `window` steps
+    first when window is given. The first d + 1 (+ window - 1) steps are masked.
+    """
+    new_cases = incidence(cumulative, axis=axis)
+    if window is not None:
+        new_cases = rolling_mean(new_cases, window, axis=axis)
+    return growth_ratio(new_cases, Tg, d=d, axis=axis)
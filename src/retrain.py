@@ -0,0 +1,85 @@
+import numpy as np
+
+from model_registry import data_fingerprint, data_state
+
+# New data may fall this far (as a fraction of the fitted range) outside the scaler
+# range before the scaled inputs are considered too different for a fine-tune
+DRIFT_TOLERANCE = 0.1
+# A fine-tune takes smaller steps than the first fit, so a few new windows nudge the
+# weights instead of overwriting what was learned from the full history
+FINE_TUNE_LR_SCALE = 0.1
+
+
+def scaler_drift(sc, frame):
+    """How far the frame falls outside the range a MinMaxScaler was fitted on.
+
+    Returns the largest overshoot of any column as a fraction of its fitted range,
+    0 when all values are within the range.
+    """
+    values = frame.to_numpy(dtype=np.float64)
+    data_range = np.where(sc.data_range_ > 0, sc.data_range_, 1.0)
+    above = (np.nanmax(values, axis=0) - sc.data_max_) / data_range
+    below = (sc.data_min_ - np.nanmin(values, axis=0)) / data_range
+    return float(np.clip(np.maximum(above, below), 0, None).max())
+
+
+def fine_tune(model, X_new, y_new, epochs=5, batch_size=32, learning_rate=None):
+    """Continue training a copy of a fitted model on new windows only.
+
+    The optimizer is rebuilt from the model's own optimizer config, with its learning rate
+    scaled by FINE_TUNE_LR_SCALE unless learning_rate is given.
+    """
+    from tensorflow import keras
+    tuned = keras.models.clone_model(model)
+    tuned.set_weights(model.get_weights())
+    config = model.optimizer.get_config()
+    if learning_rate is None:
+        learning_rate = float(keras.ops.convert_to_numpy(model.optimizer.learning_rate)) * FINE_TUNE_LR_SCALE
+    config["learning_rate"] = learning_rate
+    tuned.compile(optimizer=type(model.optimizer).from_config(config), loss=model.loss)
+    tuned.fit(X_new, y_new, epochs=epochs, batch_size=batch_size)
+    return tuned
+
+
+def incremental_retrain(registry, key, frame, train, epochs=5, tolerance=DRIFT_TOLERANCE):
+    """Bring the model of `key` up to date with the training frame.
+
+    Loads the last saved model and feature pipeline of the key and fine-tunes it on the windows
+    that end in rows added since, unless the scalers drifted more than `tolerance`
+    or the frame does not simply extend the old one, then it retrains from scratch.
+
+    Parameters:
+    registry (ModelRegistry): Where the models are kept
+    key (str): From model_registry.model_key
+    frame (DataFrame): The full training frame, indexed by date
+    train (callable): train() -> (model, state) for a full retrain, state holds the fitted
+        feature_pipeline.FeaturePipeline as "pipeline"
+
+    Returns (model, state, mode) with mode "cached", "fine_tuned" or "retrained"
+    """
+    fingerprint = data_fingerprint(frame)
+    entry = registry.load(key, fingerprint)
+    if entry is not None:
+        return entry[0], entry[1], "cached"
+
+    latest = registry.latest(key)
+    previous = registry.load(key, latest) if latest is not None else None
+    if previous is not None:
+        model, state = previous
+        pipeline = state["pipeline"]
+        steps = pipeline.steps
+        last_index = state.get("last_index")
+        new_rows = int((frame.index > last_index).sum()) if last_index is not None else 0
+        extends = 0 < new_rows < len(frame) - steps and frame.index[-new_rows - 1] == last_index
+        if extends and scaler_drift(pipeline.sc, frame[pipeline.columns].iloc[-new_rows:]) <= tolerance:
+            # Every new row is the target of one window made of the `steps` rows before it
+            X_new, y_new = pipeline.training_windows(frame.iloc[-(new_rows + steps):])
+            model = fine_tune(model, X_new, y_new, epochs=epochs)
+            state = data_state(state, frame)
+            registry.save(key, fingerprint, model, state)
+            return model, state, "fine_tuned"
+
+    model, state = train()
+    state = data_state(state, frame)
+    registry.save(key, fingerprint, model, state)
+    return model, state, "retrained"
@@ -0,0 +1,231 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the writer thread of this process is coordinated
+    fcntl = None
+
+import bar_store
+from bars import Bars
+from yfinanceScraper import Scraper, next_refresh
+
+DEFAULT_SHARED_DIR = os.path.join(bar_store.DEFAULT_CACHE_DIR, "shared")
+# Longest window the dashboard asks for, every session slices its own window out of it
+SHARED_DAYS = 365
+# How often a reader looks for a newly published version, in seconds
+POLL_INTERVAL = 1.0
+# Published versions kept on disk, readers may still map the previous one
+KEEP_VERSIONS = 2
+
+_default_store = None
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def default_store():
+    """Return the process wide SharedPriceStore in DEFAULT_SHARED_DIR"""
+    global _default_store
+    if _default_store is None:
+        _default_store = SharedPriceStore()
+    return _default_store
+
+
+class SharedPriceStore:
+    """Read-only daily bars shared by every session and process on the machine.
+
+    A writer publishes all symbols at once as a new version directory of memory-mappable
+    bars.Bars columns and then swaps manifest.json to point at it. Readers map the
+    columns read only, so the pages are shared through the OS page cache no matter how
+    many sessions or processes read them, and pick up a new version on their next read.
+    """
+    def __init__(self, root=DEFAULT_SHARED_DIR, poll_interval=POLL_INTERVAL):
+        self.root = root
+        self.poll_interval = poll_interval
+        self._manifest = None
+        self._checked = 0.0
+        self._bars = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, "versions"), exist_ok=True)
+
+    def version_dir(self, version):
+        return os.path.join(self.root, "versions", version)
+
+    def symbol_dir(self, version, symbol):
+        return os.path.join(self.version_dir(version), quote(symbol, safe=""))
+
+    def read_manifest(self):
+        """The manifest of the published version, or None before the first publish"""
+        try:
+            with open(os.path.join(self.root, "manifest.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @property
+    def manifest(self):
+        """The current manifest, re-read at most every poll_interval seconds"""
+        with self._lock:
+            now = time.monotonic()
+            if self._manifest is None or now - self._checked >= self.poll_interval:
+                manifest = self.read_manifest()
+                if manifest is None or self._manifest is None or manifest["version"] != self._manifest["version"]:
+                    # Maps of the old version stay valid for whoever still holds them
+                    self._bars = {}
+                self._manifest = manifest
+                self._checked = now
+            return self._manifest
+
+    def symbols(self):
+        manifest = self.manifest
+        return [] if manifest is None else list(manifest["symbols"])
+
+    def get(self, symbol):
+        """The published bars of symbol as memory-mapped read only columns, or None"""
+        manifest = self.manifest
+        if manifest is None or symbol not in manifest["symbols"]:
+            return None
+        with self._lock:
+            if symbol not in self._bars:
+                self._bars[symbol] = Bars.load(self.symbol_dir(manifest["version"], symbol))
+            return self._bars[symbol]
+
+    def window(self, symbol, n_days):
+        """Views on the bars of the past n_days, or None if the published window is shorter"""
+        manifest = self.manifest
+        if manifest is None or manifest["n_days"] < n_days:
+            return None
+        bars = self.get(symbol)
+        if bars is None:
+            return None
+        start, end = bar_store.history_window(n_days)
+        return bars.slice(start, end)
+
+    def publish(self, bars, n_days):
+        """Write a new version with the bars of every symbol and make it the current one.
+
+        Parameters:
+        bars (dict): symbol -> bars.Bars
+        n_days (int): Length of the window the bars cover
+        """
+        version = f"{time.time_ns()}-{os.getpid()}"
+        tmp_dir = tempfile.mkdtemp(dir=os.path.join(self.root, "versions"), prefix=".tmp-")
+        for symbol, symbol_bars in bars.items():
+            symbol_bars.save(os.path.join(tmp_dir, quote(symbol, safe="")))
+        os.rename(tmp_dir, self.version_dir(version))
+
+        manifest = {"version": version, "symbols": list(bars), "n_days": n_days,
+                    "published": pd.Timestamp.now(tz="UTC").isoformat()}
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(self.root, "manifest.json"))
+        with self._lock:
+            self._manifest, self._checked, self._bars = manifest, time.monotonic(), {}
+        self.prune(keep=version)
+        return manifest
+
+    def prune(self, keep):
+        """Remove all but the newest KEEP_VERSIONS versions (and never `keep`)"""
+        versions = sorted((v for v in os.listdir(os.path.join(self.root, "versions")) if not v.startswith(".")),
+                          key=lambda v: int(v.split("-")[0]))
+        for version in versions[:-KEEP_VERSIONS]:
+            if version != keep:
+                # Files still mapped by a reader stay readable until it lets go (on POSIX)
+                shutil.rmtree(self.version_dir(version), ignore_errors=True)
+
+
+class SharedStoreWriter(threading.Thread):
+    """Background thread refreshing a SharedPriceStore at every next_refresh().
+
+    Only one writer on the machine publishes at a time: the others find the lock file
+    taken and just wait for their next turn, taking over if the writing process exits.
+    """
+    def __init__(self, store, tickers, n_days=SHARED_DAYS, bar_cache=None):
+        super().__init__(name="shared-store-writer", daemon=True)
+        self.store = store
+        self.tickers = list(tickers)
+        self.n_days = n_days
+        self.bar_cache = bar_store.default_store() if bar_cache is None else bar_cache
+        self.errors = []
+        self._stopped = threading.Event()
+        self._publish_lock = threading.Lock()
+
+    def acquire(self):
+        """Take the machine wide writer lock, returns the open lock file or None if taken"""
+        if not self._publish_lock.acquire(blocking=False):
+            return None
+        if fcntl is None:
+            return self._publish_lock
+        lock_file = open(os.path.join(self.store.root, "writer.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            self._publish_lock.release()
+            return None
+        return lock_file
+
+    def release(self, lock_file):
+        if lock_file is not self._publish_lock:
+            lock_file.close()
+        self._publish_lock.release()
+
+    def stale(self):
+        """True when nothing (long enough) is published or the published bars missed a close"""
+        manifest = self.store.manifest
+        if manifest is None or manifest["n_days"] < self.n_days:
+            return True
+        return next_refresh(pd.Timestamp(manifest["published"])) <= pd.Timestamp.now(tz="UTC")
+
+    def refresh(self):
+        """Download the window once and publish it, returns the manifest or None if another
+        writer holds the lock"""
+        lock_file = self.acquire()
+        if lock_file is None:
+            return None
+        try:
+            frames = Scraper.bulk_history(self.tickers, n_days=self.n_days, store=self.bar_cache)
+            bars = {symbol: Bars.from_frame(frame, symbol=symbol) for symbol, frame in frames.items()}
+            # Keep the last published bars of symbols that failed this time
+            for symbol in self.tickers:
+                if symbol not in bars and self.store.get(symbol) is not None:
+                    bars[symbol] = self.store.get(symbol)
+            return self.store.publish(bars, self.n_days)
+        finally:
+            self.release(lock_file)
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                if self.stale():
+                    self.refresh()
+            except Exception as error:
+                self.errors.append(error)
+            wait = (next_refresh() - pd.Timestamp.now(tz="UTC")).total_seconds()
+            self._stopped.wait(max(wait, 1.0))
+
+    def stop(self):
+        self._stopped.set()
+
+
+def start_writer(tickers, n_days=SHARED_DAYS, store=None):
+    """Start the process wide writer thread once and return it.
+
+    Returns right away, the first publish happens on the thread. Until then readers get
+    None and Scraper falls back to its own history.
+    """
+    global _writer
+    store = default_store() if store is None else store
+    with _writer_lock:
+        if _writer is None:
+            _writer = SharedStoreWriter(store, tickers, n_days=n_days)
+            _writer.start()
+    return _writer
@@ -0,0 +1,56 @@
+import pandas as pd
+
+# Number of previous daily bars a new high/low is measured against
+LOOKBACK = 15
+
+
+def cvr_trigger(open_, high, low, close, lookback=LOOKBACK, threshold=0.0, price=None):
+    """Compute the Connors CVR trigger for every bar in one pass.
+
+    Works on Series (one ticker) as well as on wide DataFrames with one column per
+    ticker, the rolling max/min are computed column wise.
+
+    Parameters:
+    open_, high, low, close: Price series or wide frames with the same shape
+    lookback (int): Number of previous bars the new high/low is measured against
+    threshold (float): Fraction the price has to clear the old extreme by
+    price: Price compared with the old extremes. Defaults to the bar's own high and low,
+        pass close to compare the closing price like Scraper.recommendation does.
+
+    Returns:
+    dict of boolean objects shaped like the inputs: new_high, new_low, up_today, buy, sell
+    """
+    # Extremes of the previous `lookback` bars, today's bar is not part of its own window
+    prior_high = high.rolling(lookback, min_periods=lookback).max().shift(1)
+    prior_low = low.rolling(lookback, min_periods=lookback).min().shift(1)
+
+    new_high = (high if price is None else price) > prior_high * (1 + threshold)
+    new_low = (low if price is None else price) < prior_low * (1 - threshold)
+    up_today = close > open_
+
+    return {
+        "new_high": new_high,
+        "new_low": new_low,
+        "up_today": up_today,
+        # A new high that closes below its open is a buy, a new low closing above its open a sell
+        "buy": new_high & ~up_today,
+        "sell": new_low & up_today,
+    }
+
+
+def cvr_signals(data, lookback=LOOKBACK, threshold=0.0, use_close=False):
+    """Return a boolean signal frame for a Scraper style history frame or bars.Bars.
+
+    The frame has the columns new_high, new_low, up_today, buy and sell and is indexed
+    by the datetime column when the history has one.
+    """
+    if hasattr(data, "series"):
+        # Bars: wrap the columns in Series without copying them
+        data = pd.DataFrame({field: data.series(field) for field in ("open", "high", "low", "close")},
+                            copy=False)
+    elif "datetime" in data.columns:
+        data = data.set_index("datetime")
+    result = cvr_trigger(data["open"], data["high"], data["low"], data["close"],
+                         lookback=lookback, threshold=threshold,
+                         price=data["close"] if use_close else None)
+    return pd.DataFrame(result)
@@ -0,0 +1,64 @@
+import numpy as np
+from scipy.integrate import odeint
+
+# Percentiles of the default uncertainty band
+BANDS = (5, 50, 95)
+
+
+def deriv(y, t, beta_n, gamma):
+    """The SIR differential equations of many scenarios at once.
+
+    y holds (S, I) of every scenario next to each other, scenario after scenario, so the
+    Jacobian is banded. C and R follow from S and I (see solve) and are not integrated.
+    beta_n is beta / N.
+    """
+    state = y.reshape(-1, 2)
+    new = beta_n * state[:, 0] * state[:, 1]
+    dy = np.empty_like(state)
+    dy[:, 0] = -new
+    dy[:, 1] = new - gamma * state[:, 1]
+    return dy.ravel()
+
+
+def solve(days, R, Tg, population, infected, immune):
+    """Integrate the classical SIR model for every combination of the parameters in one odeint call.
+
+    The parameters broadcast against each other, every output has their shape plus a time axis.
+
+    Parameters:
+    days (int): Number of days, the time grid is np.linspace(0, days, days) like inspo.main
+    R (float): Reproduction number at the start
+    Tg (float): Generation time in days, gamma = 1 / Tg
+    population (float): Total population N
+    infected (float): Infected persons on day zero
+    immune (float): Immune persons on day zero
+
+    Returns a dict with the S, I, C and R series and the beta and gamma of every scenario
+    """
+    R, Tg, population, infected, immune = np.broadcast_arrays(
+        *(np.asarray(value, dtype=np.float64) for value in (R, Tg, population, infected, immune)))
+    batch = R.shape
+    R, Tg, population, infected, immune = (value.ravel() for value in (R, Tg, population, infected, immune))
+
+    susceptible = population - infected - immune
+    gamma = 1. / Tg
+    # R is the effective reproduction number with the immune part of the population at the start
+    beta = R * gamma / (susceptible / population)
+
+    y0 = np.stack([susceptible, infected], axis=1).ravel()
+    t = np.linspace(0, days, days)
+    solution = odeint(deriv, y0, t, args=(beta / population, gamma), ml=1, mu=1)
+
+    # (time, scenario, state) -> (state, scenario, time)
+    S, I = solution.reshape(days, -1, 2).transpose(2, 1, 0)
+    # Everybody who left S is a case, and the population is constant
+    C = infected[:, None] + susceptible[:, None] - S
+    recovered = population[:, None] - S - I
+    shape = batch + (days,)
+    return {"S": S.reshape(shape), "I": I.reshape(shape), "C": C.reshape(shape), "R": recovered.reshape(shape),
+            "beta": beta.reshape(batch), "gamma": gamma.reshape(batch)}
+
+
+def percentile_bands(values, q=BANDS):
+    """Percentiles over all scenarios of a (scenarios..., time) array, shaped (len(q), time)"""
+    return np.percentile(values.reshape(-1, values.shape[-1]), q, axis=0)
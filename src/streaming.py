@@ -0,0 +1,129 @@
+import csv
+import datetime
+from collections import deque, namedtuple
+
+import pandas as pd
+
+import signals
+
+TriggerEvent = namedtuple("TriggerEvent", ["symbol", "timestamp", "signal", "active", "price"])
+
+
+def _day(timestamp):
+    return timestamp.date() if isinstance(timestamp, datetime.datetime) else timestamp
+
+
+class MonotonicWindow:
+    """Max (or min) of the last `size` values, amortized O(1) per push.
+
+    The deque keeps (position, value) pairs with monotonic values, so the extreme
+    is always at the front and every value is pushed and popped at most once.
+    """
+    def __init__(self, size, mode="max"):
+        self.size = size
+        self._better = (lambda new, old: new >= old) if mode == "max" else (lambda new, old: new <= old)
+        self._values = deque()
+        self._count = 0
+
+    def push(self, value):
+        while self._values and self._better(value, self._values[-1][1]):
+            self._values.pop()
+        self._values.append((self._count, value))
+        self._count += 1
+        while self._values[0][0] <= self._count - 1 - self.size:
+            self._values.popleft()
+
+    @property
+    def full(self):
+        return self._count >= self.size
+
+    @property
+    def value(self):
+        return self._values[0][1] if self._values else None
+
+
+class StreamingTrigger:
+    """CVR trigger for one symbol, updated with every intraday price.
+
+    The highs and lows of the previous `lookback` completed days are kept in monotonic
+    deques, so every tick only compares against the fronts of the deques.
+    """
+    def __init__(self, symbol, lookback=signals.LOOKBACK):
+        self.symbol = symbol
+        self.highs = MonotonicWindow(lookback, "max")
+        self.lows = MonotonicWindow(lookback, "min")
+        self.day = None
+        self.open = self.high = self.low = self.last = None
+        self.state = {"buy": False, "sell": False}
+
+    def seed(self, data):
+        """Fill the window with completed daily bars, e.g. Scraper.historic_data"""
+        for high, low in zip(data["high"], data["low"]):
+            self.highs.push(high)
+            self.lows.push(low)
+
+    def _roll(self, day):
+        # The finished day becomes part of the window of the new day
+        if self.day is not None:
+            self.highs.push(self.high)
+            self.lows.push(self.low)
+        self.day = day
+        self.open = self.high = self.low = None
+        self.state = {"buy": False, "sell": False}
+
+    def update(self, timestamp, price, high=None, low=None):
+        """Feed a tick (or a bar with its high and low), returns the list of trigger events"""
+        day = _day(timestamp)
+        if day != self.day:
+            self._roll(day)
+            self.open = price
+        high = price if high is None else high
+        low = price if low is None else low
+        self.high = high if self.high is None else max(self.high, high)
+        self.low = low if self.low is None else min(self.low, low)
+        self.last = price
+
+        if not self.highs.full:
+            return []
+        new_high = self.high > self.highs.value
+        new_low = self.low < self.lows.value
+        up_today = price > self.open
+        state = {"buy": new_high and not up_today, "sell": new_low and up_today}
+
+        events = [TriggerEvent(self.symbol, timestamp, signal, active, price)
+                  for signal, active in state.items() if active != self.state[signal]]
+        self.state = state
+        return events
+
+    def update_bar(self, timestamp, open_, high, low, close):
+        """Feed a complete intraday bar"""
+        events = []
+        if _day(timestamp) != self.day:
+            events += self.update(timestamp, open_)
+        return events + self.update(timestamp, close, high=high, low=low)
+
+
+class TriggerMonitor:
+    """Streaming triggers for many symbols at once"""
+    def __init__(self, lookback=signals.LOOKBACK, history=None):
+        self.lookback = lookback
+        self.triggers = {}
+        for symbol, data in (history or {}).items():
+            self.trigger(symbol).seed(data)
+
+    def trigger(self, symbol):
+        if symbol not in self.triggers:
+            self.triggers[symbol] = StreamingTrigger(symbol, self.lookback)
+        return self.triggers[symbol]
+
+    def process(self, ticks):
+        """Consume (symbol, timestamp, price) ticks and yield every trigger event as it happens"""
+        for symbol, timestamp, price in ticks:
+            yield from self.trigger(symbol).update(timestamp, price)
+
+
+def replay_csv(path):
+    """Yield (symbol, timestamp, price) ticks from a csv file with those three columns"""
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            yield row["symbol"], pd.Timestamp(row["timestamp"]).to_pydatetime(), float(row["price"])
@@ -0,0 +1,100 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import backtest
+import signals
+
+# Set in every worker by _init_worker, the arrays are views on shared memory
+_shared = {}
+
+
+def _share(array):
+    """Copy an array into a new shared memory block, returns (block, description)"""
+    array = np.ascontiguousarray(array, dtype=np.float64)
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return block, (block.name, array.shape)
+
+
+def _attach(description):
+    name, shape = description
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+
+
+def _init_worker(vix_description, close_description):
+    vix_block, vix = _attach(vix_description)
+    close_block, close = _attach(close_description)
+    # Keep the blocks referenced, the arrays are only valid while they are open
+    _shared.update(vix_block=vix_block, close_block=close_block, vix=vix, close=close)
+
+
+def _run_cell(lookback, threshold, holding_periods, allow_short, cost):
+    """Backtest one (lookback, threshold) cell for every holding period and every ticker"""
+    vix = pd.DataFrame(_shared["vix"], columns=["open", "high", "low", "close"])
+    close = _shared["close"]
+    trigger = signals.cvr_trigger(vix["open"], vix["high"], vix["low"], vix["close"],
+                                  lookback=lookback, threshold=threshold)
+    # Shape (bars, 1) so one VIX trigger broadcasts over all traded tickers
+    buy = trigger["buy"].to_numpy()[:, None]
+    sell = trigger["sell"].to_numpy()[:, None]
+
+    results = []
+    for holding_period in holding_periods:
+        _, stats = backtest.simulate(buy, sell, close, holding_period, allow_short, cost)
+        results.append((lookback, threshold, holding_period,
+                        {key: np.broadcast_to(value, close.shape[1:]) for key, value in stats.items()}))
+    return results
+
+
+def run_sweep(vix, instruments, lookbacks=range(5, 61, 5), thresholds=(0.0,),
+              holding_periods=(1, 3, 5, 10, 20), allow_short=False, cost=0.0, max_workers=None):
+    """Sweep the trigger parameters over many traded tickers on a process pool.
+
+    The VIX bars and the closing prices of all instruments are put in shared memory
+    once, the workers only receive the parameters of their grid cell.
+
+    Parameters:
+    vix (DataFrame): VIX history (open, high, low, close)
+    instruments (dict): name -> history frame of every traded ticker
+    max_workers (int): Number of worker processes, all cores by default
+
+    Returns a tidy DataFrame with one row per (ticker, lookback, threshold, holding period)
+    """
+    # Fail here instead of in every worker
+    for holding_period in holding_periods:
+        backtest.check_holding_period(holding_period)
+    cells = list(itertools.product(lookbacks, thresholds))
+    if not instruments or not cells or not len(holding_periods):
+        return pd.DataFrame(columns=["ticker", "lookback", "threshold", "holding_period", *backtest.METRICS])
+    vix = backtest.by_date(vix)
+    closes = pd.DataFrame({name: backtest.by_date(data)["close"] for name, data in instruments.items()})
+    dates = vix.index.intersection(closes.index)
+    vix_values = vix.loc[dates, ["open", "high", "low", "close"]].to_numpy(dtype=np.float64)
+    # Forward fill so holidays of one market do not break the returns of the others. Bars before
+    # a ticker was listed stay nan, backtest.simulate holds no position there
+    close_values = closes.loc[dates].ffill().to_numpy(dtype=np.float64)
+    names = list(closes.columns)
+
+    vix_block, vix_description = _share(vix_values)
+    close_block, close_description = _share(close_values)
+    tables = []
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), initializer=_init_worker,
+                                 initargs=(vix_description, close_description)) as pool:
+            futures = [pool.submit(_run_cell, lookback, threshold, tuple(holding_periods), allow_short, cost)
+                       for lookback, threshold in cells]
+            for future in futures:
+                for lookback, threshold, holding_period, stats in future.result():
+                    tables.append(pd.DataFrame({"ticker": names, "lookback": lookback, "threshold": threshold,
+                                                "holding_period": holding_period, **stats}))
+    finally:
+        for block in (vix_block, close_block):
+            block.close()
+            block.unlink()
+    return pd.concat(tables, ignore_index=True)
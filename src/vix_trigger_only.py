@@ -1,5 +1,4 @@
 import datetime
-import yfinance as yf
 from glob import glob
 import streamlit as st
 import numpy as np
@@ -23,6 +22,7 @@ def main_vix(days_back):
     start = current_datetime - datetime.timedelta(days=days_back)
 
     # Retrieve historical data from the VIX index via Yahoo's API
+    import yfinance as yf
     vix = yf.Ticker(f"^{SYMBOL}")
 
     # Collect all data once more for one month
@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from glob import glob
 import streamlit as st
 import numpy as np
@@ -7,9 +8,12 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import streamlit as st
 import yfinanceScraper 
+import bar_store
+import shared_store
 import ticker_manager
-import model as model_util
-import matplotlib.pyplot as plt
+import model_registry
+import inference_service
+import panel
 import pandas as pd
 import vix_trigger_only
 
@@ -30,18 +34,52 @@ and applies the following rules:
 
 It makes use of the yahoo stock quotes python library to scrape the necessary data from Yahoo Finance. 
 The program will also provide you with a chart of the VIX index from the time period as an interactive candleplot.
-Volume is included in the chart, but as a random number just to show more info on the chart.
+Volume is included in the chart as bars below the candles.
 """
 )
 # Number of days of historical data to fetch (not counting today)
 days_back = st.sidebar.slider('Number of days in graph and data', 15, 365, 60)
 stepsize = st.sidebar.slider('Size of time window used for 1 lag prediction', 15,100, 15)
+horizon = st.sidebar.slider('Number of trading days to forecast past the data', 0, 30, 5)
+# Longer windows are drawn with wider candles, each one covering several trading days
+max_candles = st.sidebar.slider('Maximum number of candles in a candleplot', 30, 365, 120)
+
+# Caches shared by all sessions and reruns. Every cache is bounded by max_entries and
+# expires after CACHE_TTL seconds, so a long running server does not grow without bound.
+CACHE_TTL = 6 * 3600
+# Seconds a session waits for the shared prediction service before giving up on a ticker
+PREDICT_TIMEOUT = 60
+
+@st.cache_resource(max_entries=1)
+def get_shared_prices():
+    """The shared price store, with its background writer started once per server"""
+    # One background writer per machine keeps the whole universe in the shared memory-mapped store,
+    # every session reads views on the same pages instead of holding its own copy of the prices
+    shared_store.start_writer([ticker.value for ticker in ticker_manager.Ticker], n_days=shared_store.SHARED_DAYS)
+    return shared_store.default_store()
+
+@st.cache_resource(max_entries=256, ttl=CACHE_TTL)
+def get_scraper(symbol, n_days):
+    """One lazy Scraper handle per (ticker, window) for the whole server"""
+    return yfinanceScraper.Scraper(ticker=symbol, n_days=n_days, shared=get_shared_prices())
+
+def data_key(scraper, n_days):
+    """(ticker, date range, last bar) of the data a scraper serves right now, a new bar changes it"""
+    start, end = bar_store.history_window(n_days)
+    bars = scraper.bars
+    return scraper.name, str(start), str(end), int(bars.day[-1]) if len(bars) else None
+
+@st.cache_data(max_entries=64, ttl=CACHE_TTL, show_spinner=False)
+def prediction_frame(keys, n_days):
+    """The aligned training frame of the tickers, keyed on the data_key of every ticker"""
+    prices = panel.build_panel({name: get_scraper(symbol, n_days).bars for name, (symbol, *_) in keys})
+    return prices.to_frame().fillna(0)
 
 vix_or_no = st.sidebar.checkbox("Do you want to see the vix_trigger prediction")
 if vix_or_no:
     #vix_trigger_only.main_vix(days_back)
 
-    scraper = yfinanceScraper.Scraper(n_days=days_back)
+    scraper = get_scraper("^VIX", days_back)
     print(scraper.historic_data)
     # Get the recommendation
     st.json(scraper.recommendation(api=True))
@@ -52,7 +90,7 @@ st.sidebar.write("What Tickers do you want to use?")
 #data_dict = gather_tickers()
 def get_ticker_name(ticker):
     return ticker.name
-data_dict = {ticker: yfinanceScraper.Scraper(ticker=ticker.value, n_days=days_back) for ticker in ticker_manager.Ticker}
+data_dict = {ticker: get_scraper(ticker.value, days_back) for ticker in ticker_manager.Ticker}
 
 ticker_form = st.sidebar.form("ticker_form")
 data_list = ticker_form.multiselect(
@@ -67,26 +105,37 @@ st.write("""The program will Furthermore give you an idea of the trend with a pr
 
 
 options = ticker_form.multiselect(
-     "Which ticker would you like to display and predict? (Can only predict one ticker at a time)",
+     "Which ticker would you like to display and predict?",
      data_dict.keys(), format_func=get_ticker_name, default=list(data_dict.keys())[0])
 
 
 submitted = ticker_form.form_submit_button("Submit")
 #st.sidebar.write('You selected:', options)
-@st.cache(allow_output_mutation=True)
-def create_candleplot(scraper):
-    df = scraper.historic_data
-    
+# Dates go to the browser as epoch milliseconds on a date axis, a typed array instead of date strings
+MS_PER_DAY = 86_400_000
+
+@st.cache_data(max_entries=64, ttl=CACHE_TTL, show_spinner=False)
+def create_candleplot(name, fingerprint, max_candles, _bars):
+    """Candle and volume figure of the bars, cached on the bars' fingerprint (_bars is not hashed)
+
+    Windows longer than max_candles are drawn as wider candles (Bars.downsample), so the
+    payload stays the same size however far back the chart goes and a short window keeps
+    every daily bar. All traces are NumPy float32 arrays, which Plotly sends to the
+    browser base64 encoded instead of as JSON numbers.
+    """
+    bars = _bars.downsample(max_candles)
+    x = bars.day.astype(np.float64) * MS_PER_DAY
+
     fig = make_subplots(rows=2, cols=1, row_heights=[1, 0.2], vertical_spacing=0)
 
-    fig.add_trace(go.Candlestick(x=df['datetime'],
-                                         open=df['open'],
-                                         high=df['high'],
-                                         low=df['low'],
-                                         close=df['close'],
-                                increasing_line_color='#0384fc', decreasing_line_color='#e8482c', name=scraper.name), row=1, col=1)
+    fig.add_trace(go.Candlestick(x=x,
+                                         open=np.asarray(bars.open, dtype=np.float32),
+                                         high=np.asarray(bars.high, dtype=np.float32),
+                                         low=np.asarray(bars.low, dtype=np.float32),
+                                         close=np.asarray(bars.close, dtype=np.float32),
+                                increasing_line_color='#0384fc', decreasing_line_color='#e8482c', name=name), row=1, col=1)
 
-    fig.add_trace(go.Scatter(x=df['datetime'], y=np.random.randint(20, 40, len(df)), marker_color='#fae823', name='VO', hovertemplate=[]), row=2, col=1)
+    fig.add_trace(go.Bar(x=x, y=bars.volume.astype(np.float32), marker_color='#fae823', name='VO', hovertemplate=[]), row=2, col=1)
 
     fig.update_layout({'plot_bgcolor': "#21201f", 'paper_bgcolor': "#21201f", 'legend_orientation': "h"},
                     legend=dict(y=1, x=0),
@@ -96,7 +145,7 @@ def create_candleplot(scraper):
     fig.update_yaxes(showgrid=False, zeroline=False, showticklabels=True,
                     showspikes=True, spikemode='across', spikesnap='cursor', showline=False, spikedash='solid')
 
-    fig.update_xaxes(showgrid=False, zeroline=False, rangeslider_visible=False, showticklabels=True,
+    fig.update_xaxes(type='date', showgrid=False, zeroline=False, rangeslider_visible=False, showticklabels=True,
                     showspikes=True, spikemode='across', spikesnap='cursor', showline=False, spikedash='solid')
 
     fig.update_layout(hoverdistance=1)
@@ -113,7 +162,8 @@ def async_streamlit_candleplot(ticker, data):
     data (list): All price data for the VIX index 15 days back
     """
     st.subheader(f"{ticker.name} Candlestick Chart")
-    fig = create_candleplot(data)
+    bars = data.bars
+    fig = create_candleplot(data.name, bars.fingerprint(), max_candles, bars)
     st.plotly_chart(fig)
 
 
@@ -138,58 +188,81 @@ if viz_candles: create_all_plots()
 
 use_machine_learning_to_pred = use_machine_learning_to.button("Train model and get prediction graph")
 if use_machine_learning_to_pred: 
-    if len(options) < 2:
-
-        predictorname = options[0].name
-        df = None
-        for ticker in data_list:
-            data =data_dict[ticker].historic_data
-            data.columns = [ticker.name + "."+ x for x in data.columns]
-            if df is None:
-                df = data
-                #print(df)
-            else:
-                df = pd.concat((df, data), axis=1)
-
-
-        df = df.fillna(0)
-        df = df.set_index(predictorname+"."+"datetime")
-        for col in df.columns:
-            if "datetime" in col:
-                df.drop(col, axis=1, inplace=True)
-
-        predictor_col_ind = 0
-        for col in df.columns:
-            if col != predictorname+"."+"close":
-                predictor_col_ind += 1
-            else:
-                break
-
-
-        df = df[df.index != 0]
-
-        train_data, test_data, total_data = df[0:int(len(df)*0.7)], df[int(len(df)*0.7):], df
-
-        X_train, y_train, sc, sc_target = model_util.preproccess(train_data, predictor_col_ind, steps=stepsize)
-        inputs = total_data.iloc[len(total_data) - len(test_data) - stepsize:]
-        print(inputs.shape)
-        with st.spinner('Training model'):
+    # TensorFlow, scikit-learn and matplotlib are only loaded once somebody actually trains
+    import matplotlib.pyplot as plt
+    import model as model_util
+    plt.style.use('fivethirtyeight')
+
+    # All selected tickers aligned on their trading dates, the cached histories are only read
+    keys = tuple((ticker.name, data_key(data_dict[ticker], days_back)) for ticker in data_list)
+    df = prediction_frame(keys, days_back)
+
+    train_data, test_data, total_data = df[0:int(len(df)*0.7)], df[int(len(df)*0.7):], df
+    inputs = total_data.iloc[len(total_data) - len(test_data) - stepsize:]
+    print(inputs.shape)
+
+    # Train (or reuse) one model per predicted ticker, then predict them all in one batched round
+    predictor = inference_service.default_predictor()
+    jobs = {}
+    for option in options:
+        predictorname = option.name
+        if predictorname+"."+"close" not in df.columns:
+            st.error(f"{predictorname} has to be one of the tickers used as data to be predicted")
+            continue
+        predictor_col_ind = list(df.columns).index(predictorname+"."+"close")
+
+        def train():
+            # Only on a registry miss: fit the pipeline, build the windows, fit and score the model
+            X_train, y_train, pipeline = model_util.preproccess(train_data, predictor_col_ind, steps=stepsize)
             lstm = model_util.model_build_and_fit(X_train, y_train)
-
-        
-
-
-        X_test = model_util.preproccess_inference(inputs, steps=stepsize, sc=sc)
-
-        predicted_stock_price = lstm.predict(X_test)
-        mse = lstm.evaluate(X_train, y_train)
-        st.success(f"LSTM trained and predicted {options} with MSE: {mse}")
-        predicted_stock_price = sc_target.inverse_transform(predicted_stock_price)
+            return lstm, {"pipeline": pipeline, "mse": lstm.evaluate(X_train, y_train)}
+
+        # Same tickers, stepsize, architecture and data as an earlier run: reuse the fitted model
+        key = model_registry.model_key([ticker.name for ticker in data_list], predictorname, stepsize,
+                                       model_util.ARCHITECTURE)
+        try:
+            with st.spinner(f'Training model for {predictorname}'):
+                lstm, state, reused = model_registry.default_registry().get_or_train(key, train_data, train)
+            if reused:
+                st.info(f"Reusing a model trained earlier on the same data for {predictorname}")
+            st.success(f"LSTM trained for {predictorname} with MSE: {state['mse']}")
+
+            predictor.add_model(key, lstm)
+            # The pipeline fitted at training time only transforms here, nothing is refitted
+            X_test = model_util.preproccess_inference(inputs, steps=stepsize, sc=state["pipeline"])
+            # The request carries its model, another session evicting `key` meanwhile cannot fail it
+            future = predictor.submit(key, X_test, model=lstm)
+        except Exception as error:
+            st.error(f"Could not train or predict {predictorname}: {error}")
+            continue
+        jobs[key] = (predictorname, predictor_col_ind, state["pipeline"], lstm, future)
+
+    for key, (predictorname, predictor_col_ind, pipeline, lstm, future) in jobs.items():
+        try:
+            predicted_stock_price = pipeline.inverse_target(future.result(timeout=PREDICT_TIMEOUT))
+        except FuturesTimeoutError:
+            st.error(f"The prediction for {predictorname} took longer than {PREDICT_TIMEOUT} seconds")
+            continue
+        except Exception as error:
+            st.error(f"The prediction for {predictorname} failed: {error}")
+            continue
+        path = None
+        if horizon:
+            # Feed every prediction back in as the next day's close, starting from the latest window
+            last_window = pipeline.transform(total_data.iloc[-stepsize:])[None]
+            try:
+                path = predictor.forecast(key, last_window, horizon, pipeline.target_ind,
+                                          timeout=PREDICT_TIMEOUT, model=lstm)
+            except Exception as error:
+                st.error(f"The forecast for {predictorname} failed: {error}")
 
         # Visualising the resasdultsa
         fig = plt.figure()
         plt.plot(df.iloc[int(len(df)*0.7):].index,test_data.iloc[:, predictor_col_ind].values, color = 'red', label = 'Real')
         plt.plot(df.iloc[int(len(df)*0.7):].index,predicted_stock_price, color = 'blue', label = 'Predicted')
+        if path is not None:
+            future_dates = pd.bdate_range(df.index[-1], periods=horizon + 1)[1:]
+            plt.plot(future_dates, pipeline.inverse_target(path), color = 'green', linestyle = '--', label = 'Forecast')
         
         plt.title(f'{predictorname} Stock Price Prediction')
         plt.xlabel('Time')
@@ -201,5 +274,5 @@ if use_machine_learning_to_pred:
         plt.legend()
         # display matplotlib plot with streamlit
         st.pyplot(fig)
-    else:
-        st.error("Can only Predict one ticker at a time (will have to retrain)")
+    with st.expander("Prediction service metrics"):
+        st.json(predictor.stats())
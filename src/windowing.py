@@ -0,0 +1,30 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def sliding_windows(data, steps):
+    """Return every window of `steps` rows that ends right before a row, as a strided view.
+
+    Gives the same (samples, steps, features) array as appending data[i-steps:i, :]
+    for i in range(steps, len(data)), without copying the overlapping rows.
+    The view is read only, it shares memory with `data`.
+    """
+    data = np.asarray(data)
+    # sliding_window_view puts the window axis last: (samples + 1, features, steps)
+    windows = sliding_window_view(data, steps, axis=0)
+    return windows[:-1].transpose(0, 2, 1)
+
+
+def window_batches(data, steps, batch_size=32, targets=None):
+    """Yield (X, y) batches of windows, only one batch is copied into memory at a time.
+
+    Parameters:
+    data (array): The scaled (rows, features) matrix
+    steps (int): Window length
+    targets (array): Value to predict for every row, y is None when not given
+    """
+    windows = sliding_windows(data, steps)
+    for start in range(0, len(windows), batch_size):
+        X = np.ascontiguousarray(windows[start:start + batch_size])
+        y = None if targets is None else np.asarray(targets[steps + start:steps + start + len(X)])
+        yield X, y
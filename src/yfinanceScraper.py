@@ -1,54 +1,165 @@
-import datetime
-
 import pandas as pd
-import yfinance as yf
 
+import bar_store
+from bar_store import MARKET_CLOSE, MARKET_TZ
+from bars import Bars
+import signals
+
+
+def next_refresh(now=None):
+    """Return when cached history goes stale: at the next market close (a new daily bar)
+    or at local midnight (the n_days window moves), whichever comes first."""
+    if now is None:
+        now = pd.Timestamp.now(tz=MARKET_TZ)
+    else:
+        now = pd.Timestamp(now)
+        # A time without a timezone is taken as market time
+        now = now.tz_localize(MARKET_TZ) if now.tz is None else now.tz_convert(MARKET_TZ)
+    close = now.normalize() + pd.Timedelta(hours=MARKET_CLOSE.hour, minutes=MARKET_CLOSE.minute)
+    while close <= now or close.weekday() >= 5:
+        close += pd.Timedelta(days=1)
+    local_now = now.to_pydatetime().astimezone()
+    midnight = pd.Timestamp(local_now.replace(hour=0, minute=0, second=0, microsecond=0)) + pd.Timedelta(days=1)
+    return min(close, midnight)
 
 
 class Scraper:
     """Scraper class"""
-    def __init__(self, ticker="^VIX", n_days=30):
+    def __init__(self, ticker="^VIX", n_days=30, store=None, shared=None):
         self.name = ticker
-        self.ticker = yf.Ticker(f"{ticker}")
+        # The yf.Ticker is only created on first data access, a Scraper is a cheap handle until then
+        self._ticker = None
         self._historic_data = None
         self._ndays = n_days
+        self.store = bar_store.default_store() if store is None else store
+        # A shared_store.SharedPriceStore the bars are read from instead of this scraper's own copy
+        self.shared = shared
+        self._expires = None
+        self._bars = None
+        self._bars_source = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def ticker(self):
+        if self._ticker is None:
+            import yfinance as yf
+            self._ticker = yf.Ticker(f"{self.name}")
+        return self._ticker
 
     @property
     def historic_data(self):
-        if self._historic_data is None:
-            return self.get_historic_data(ticker=self.ticker, n_days=self._ndays)
-        else:
+        """The history of the past n_days, downloaded once and kept until next_refresh()"""
+        if self._historic_data is not None and pd.Timestamp.now(tz=MARKET_TZ) < self._expires:
+            self.cache_hits += 1
             return self._historic_data
+        self.cache_misses += 1
+        self._historic_data = self.get_historic_data(ticker=self.ticker, n_days=self._ndays, store=self.store)
+        self._expires = next_refresh()
+        return self._historic_data
+
+    @property
+    def bars(self):
+        """The history as compact bars.Bars columns, rebuilt only when the history is refreshed.
+        With a shared store these are views on its memory-mapped columns, nothing is copied."""
+        if self.shared is not None:
+            bars = self.shared.window(self.name, self._ndays)
+            if bars is not None:
+                return bars
+        data = self.historic_data
+        if self._bars is None or self._bars_source is not data:
+            self._bars = Bars.from_frame(data, symbol=self.name)
+            self._bars_source = data
+        return self._bars
+
+    def refresh(self):
+        """Drop the cached history, the next access downloads it again."""
+        self._historic_data = None
+        self._expires = None
+        self._bars = None
+
+    def cache_info(self):
+        """Return the hit/miss counters and expiry of the cached history"""
+        return {"hits": self.cache_hits, "misses": self.cache_misses, "expires": self._expires}
 
     def get_json(self, ticker_str=None, n_days=30):
         """Return json from desired dataframe"""
         if ticker_str:  # If a ticker is provided, select the provided.
+            import yfinance as yf
             ticker = yf.Ticker(f"{ticker_str}")
         else:  # Else use the one from the instance.
             ticker = self.ticker
 
         # Return data as a json
-        data = self.get_historic_data(ticker=ticker, n_days=n_days)
+        data = self.get_historic_data(ticker=ticker, n_days=n_days, store=self.store)
         return data.to_json(index=True, orient='split')
 
     @staticmethod
-    def get_historic_data(ticker, n_days=30):
-        """Get historic data from the past n_days, with the current ticker object."""
+    def get_historic_data(ticker, n_days=30, store=None):
+        """Get historic data from the past n_days, with the current ticker object.
+        With a BarStore only the bars that are not stored yet are downloaded."""
         # Time Info
-        current_datetime = datetime.datetime.now()
-        start = current_datetime - datetime.timedelta(days=n_days + 1)
-        end = current_datetime - datetime.timedelta(days=1)
+        start, end = bar_store.history_window(n_days)
 
         # Get Data
-        data = ticker.history(period='1d',
-            start=start.strftime("%Y-%m-%d"), end=end.strftime("%Y-%m-%d")
-        )
-        data.drop(labels=["Dividends", "Stock Splits"], axis=1, inplace=True)
+        if store is None:
+            data = ticker.history(period='1d',
+                start=start.strftime("%Y-%m-%d"), end=end.strftime("%Y-%m-%d")
+            )
+        else:
+            data = store.history(ticker, start, end)
+        return Scraper.format_history(data)
+
+    @staticmethod
+    def format_history(data):
+        """Turn a yfinance history frame into the lower case frame used everywhere else."""
+        data = data.drop(labels=["Dividends", "Stock Splits"], axis=1, errors="ignore")
         if data.shape[0] < 10:
             raise RuntimeError("Not enough data, we need at least Two weeks (10 days) worth!")
         data = data.reset_index().pipe(lambda d: d.rename(columns={c: c.lower() if c != "Date" else "datetime" for c in d.columns}))
         return pd.DataFrame(data)
 
+    @staticmethod
+    def download_history(symbols, start, end):
+        """Download daily bars for many symbols in one batched request.
+        Returns a dict of symbol -> yfinance style history frame."""
+        import yfinance as yf
+        data = yf.download(list(symbols), start=start.strftime("%Y-%m-%d"), end=end.strftime("%Y-%m-%d"),
+                           interval="1d", group_by="ticker", auto_adjust=True, actions=False,
+                           threads=True, progress=False)
+        frames = {}
+        for symbol in symbols:
+            if isinstance(data.columns, pd.MultiIndex):
+                if symbol not in data.columns.get_level_values(0):
+                    continue
+                frame = data[symbol]
+            else:
+                frame = data
+            frames[symbol] = frame.dropna(how="all")
+        return frames
+
+    @staticmethod
+    def bulk_history(tickers, n_days=30, store=None):
+        """Get historic data for many tickers with a single batched download.
+
+        Returns a dict of ticker -> frame formatted like get_historic_data. Tickers
+        without enough data are left out instead of failing the whole batch.
+        """
+        start, end = bar_store.history_window(n_days)
+        tickers = list(tickers)
+        if store is None:
+            raw = Scraper.download_history(tickers, start, end)
+        else:
+            raw = store.history_many(tickers, start, end, Scraper.download_history)
+
+        frames = {}
+        for ticker, data in raw.items():
+            try:
+                frames[ticker] = Scraper.format_history(data)
+            except RuntimeError:
+                continue
+        return frames
+
     def get_extreme_value(self, col, method):
         """Expected col is either Open, High, Low or Close"""
         return eval(f"self.historic_data['{col}'].{method}()")
@@ -61,6 +172,10 @@ class Scraper:
         """Get today's value from desired column."""
         return self.historic_data[col].iloc[-1]
 
+    def signal_frame(self, lookback=signals.LOOKBACK, threshold=0.0):
+        """Return the buy/sell trigger for every bar of the history"""
+        return signals.cvr_signals(self.historic_data, lookback=lookback, threshold=threshold)
+
     def recommendation(self, api=False):
         """Calculate a recommendation"""
         current_price = self.get_current_data()
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+import backtest
+
+
+@pytest.mark.parametrize("holding_period", [0, -1, 2.5])
+def test_invalid_holding_period_is_rejected(holding_period):
+    buy = np.zeros(10, dtype=bool)
+    close = np.linspace(100, 110, 10)
+    with pytest.raises(ValueError, match="holding_period"):
+        backtest.simulate(buy, buy, close, holding_period)
+
+
+def test_signal_is_held_for_the_holding_period():
+    buy = np.zeros(8, dtype=bool)
+    buy[2] = True
+    assert backtest.active(buy, 3).tolist() == [False, False, False, True, True, True, False, False]
+
+
+def test_no_position_before_the_instrument_is_listed():
+    close = np.r_[np.full(5, np.nan), np.linspace(100, 110, 10)]
+    buy = np.zeros(15, dtype=bool)
+    buy[4] = True
+    _, stats = backtest.simulate(buy, np.zeros(15, dtype=bool), close, 3)
+    assert stats["exposure"] == 0 and stats["turnover"] == 0 and stats["trades"] == 0
+
+    buy[5] = True
+    _, stats = backtest.simulate(buy, np.zeros(15, dtype=bool), close, 3)
+    # Held 3 of the 10 listed bars
+    assert np.isclose(stats["exposure"], 0.3) and stats["trades"] == 1
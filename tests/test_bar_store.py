@@ -0,0 +1,51 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from bar_store import BAR_COLUMNS, BarStore, last_session
+
+EMPTY = pd.DataFrame(columns=BAR_COLUMNS)
+
+
+def bars(*days):
+    index = pd.DatetimeIndex([pd.Timestamp(day) for day in days])
+    return pd.DataFrame({column: 1.0 for column in BAR_COLUMNS}, index=index)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = BarStore(root=str(tmp_path))
+    # Covered up to and including Tuesday 2024-03-05
+    store.update("X", [(datetime.date(2024, 3, 4), datetime.date(2024, 3, 6), bars("2024-03-04", "2024-03-05"))],
+                 now="2024-03-06 12:00")
+    return store
+
+
+def test_last_session():
+    assert last_session("2024-03-06 12:00") == datetime.date(2024, 3, 5)
+    assert last_session("2024-03-06 16:30") == datetime.date(2024, 3, 6)
+    # Monday morning: the last session was Friday
+    assert last_session("2024-03-11 09:00") == datetime.date(2024, 3, 8)
+
+
+def test_failed_top_up_stays_missing(store):
+    # Thursday evening the Wednesday and Thursday bars should exist, an empty answer is a failure
+    gap = (datetime.date(2024, 3, 6), datetime.date(2024, 3, 8))
+    store.update("X", [(*gap, EMPTY)], now="2024-03-07 18:00")
+    assert store.missing("X", datetime.date(2024, 3, 4), gap[1]) == [gap]
+
+
+def test_empty_weekend_is_covered(store):
+    store.update("X", [(datetime.date(2024, 3, 6), datetime.date(2024, 3, 9), bars("2024-03-06", "2024-03-08"))],
+                 now="2024-03-11 18:00")
+    weekend = (datetime.date(2024, 3, 9), datetime.date(2024, 3, 11))
+    store.update("X", [(*weekend, EMPTY)], now="2024-03-11 18:00")
+    assert store.missing("X", datetime.date(2024, 3, 4), weekend[1]) == []
+
+
+def test_empty_gap_reaching_the_current_session_stays_missing(store):
+    # Saturday and Sunday are empty, but on Monday before the close the gap may still be an error
+    gap = (datetime.date(2024, 3, 6), datetime.date(2024, 3, 10))
+    store.update("X", [(*gap, EMPTY)], now="2024-03-11 09:00")
+    assert store.missing("X", datetime.date(2024, 3, 4), gap[1]) == [gap]
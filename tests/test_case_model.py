@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from case_model import simulate
+
+
+@pytest.mark.parametrize("n_days", [5, 15, 20, 21, 22])
+def test_horizons_shorter_than_the_days_sick(n_days):
+    cases = simulate(n_days, days_sick=20, cases_day_zero=100, immune_day_zero=1_000)
+    # Until days_sick has passed only the infected of day zero recover, evenly
+    expected = 1_000 + 100 / 20 * np.minimum(np.arange(n_days), 20)
+    assert np.allclose(cases["recovered"][:21], expected[:21])
+    assert all(values.shape[-1] == n_days for values in cases.values())
+
+
+def test_short_horizon_batch():
+    cases = simulate(10, R2=np.linspace(1.0, 3.0, 40), days_sick=20)
+    assert cases["infected"].shape == (40, 10)
+
+
+def test_admissions_without_delay_start_on_day_one():
+    percentage, stay = 4, 21
+    cases = simulate(60, test_to_hospital=0, hospital_days_stay=stay, percentage_test_hospital=percentage)
+    assert np.isnan(cases["hospital"][0])
+    assert np.allclose(cases["hospital"][1:], cases["positivetests12"][1:] * percentage / 100)
+    # The patients admitted on day `stay` replace the (never admitted) ones of day zero
+    delta = cases["hospital_cumm"][stay] - cases["hospital_cumm"][stay - 1]
+    assert np.isclose(delta, cases["positivetests12"][stay] * percentage / 100)
@@ -0,0 +1,148 @@
+import asyncio
+import functools
+import threading
+import time
+
+import pytest
+
+from fetch_engine import FetchEngine
+
+
+class FakeTicker:
+    """Stands in for yf.Ticker: fails `failures` times per symbol, then answers after `delay` seconds"""
+    def __init__(self, symbol, failures=0, delay=0.0, calls=None):
+        self.symbol = symbol
+        self.failures = failures
+        self.delay = delay
+        self.calls = calls if calls is not None else {}
+
+    @property
+    def info(self):
+        self.calls[self.symbol] = self.calls.get(self.symbol, 0) + 1
+        time.sleep(self.delay)
+        if self.calls[self.symbol] <= self.failures:
+            raise ConnectionError(self.symbol)
+        return {"regularMarketPrice": float(len(self.symbol))}
+
+
+def engine_with(retries=0, timeout=1.0, **fake):
+    calls = {}
+    engine = FetchEngine(max_concurrency=4, retries=retries, backoff=0.01, timeout=timeout,
+                         ticker_factory=lambda symbol: FakeTicker(symbol, calls=calls, **fake))
+    return engine, calls
+
+
+def test_quotes_run_concurrently():
+    engine, _ = engine_with(delay=0.2)
+    with engine:
+        start = time.perf_counter()
+        quotes = engine.quotes(["A", "BB", "CCC", "DDDD"])
+        elapsed = time.perf_counter() - start
+    assert quotes == {"A": 1.0, "BB": 2.0, "CCC": 3.0, "DDDD": 4.0}
+    assert elapsed < 0.6
+
+
+def test_failed_calls_are_retried():
+    engine, calls = engine_with(retries=2, failures=2)
+    with engine:
+        assert engine.quotes(["A", "BB"]) == {"A": 1.0, "BB": 2.0}
+    assert calls == {"A": 3, "BB": 3}
+    assert engine.errors == {}
+
+
+def test_errors_are_collected_after_the_last_retry():
+    engine, calls = engine_with(retries=1, failures=5)
+    with engine:
+        assert engine.quotes(["A"]) == {}
+    assert calls == {"A": 2}
+    assert isinstance(engine.errors["A"], ConnectionError)
+
+
+def test_slow_calls_time_out():
+    engine, _ = engine_with(timeout=0.05, delay=0.3)
+    with engine:
+        assert engine.run({"slow": lambda: time.sleep(0.3), "fast": lambda: "done"}) == {"fast": "done"}
+    assert isinstance(engine.errors["slow"], asyncio.TimeoutError)
+
+
+def gather_threads(engine):
+    """Record the thread every batch's event loop runs on"""
+    threads = []
+    gather = engine._gather
+
+    async def recording(calls):
+        threads.append(threading.current_thread())
+        return await gather(calls)
+
+    engine._gather = recording
+    return threads
+
+
+def test_run_inside_a_running_event_loop():
+    engine, _ = engine_with()
+    threads = gather_threads(engine)
+
+    async def inside_loop():
+        return engine.run({"key": lambda: "done"})
+
+    with engine:
+        assert engine.run({"key": lambda: "done"}) == {"key": "done"}
+        assert asyncio.run(inside_loop()) == {"key": "done"}
+    # Without a loop the batch runs right here, inside one it gets a loop on its own thread
+    assert threads[0] is threading.current_thread()
+    assert threads[1] is not threading.current_thread()
+    assert threads[1].name.startswith("fetch-loop")
+
+
+def test_timed_out_calls_keep_their_slot():
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def slow():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.2)
+        with lock:
+            running[0] -= 1
+
+    engine = FetchEngine(max_concurrency=2, retries=1, backoff=0.0, timeout=0.02)
+    with engine:
+        engine.run({key: slow for key in range(6)})
+    assert len(engine.errors) == 6
+    assert peak[0] == 2
+
+
+def test_timeout_starts_when_the_call_runs():
+    # Five calls of 0.1 s through a single worker: the later ones wait longer than the timeout
+    engine = FetchEngine(max_concurrency=1, retries=0, timeout=0.3)
+    with engine:
+        results = engine.run({key: functools.partial(time.sleep, 0.1) for key in range(5)})
+    assert len(results) == 5 and engine.errors == {}
+
+
+def test_queue_timeout_bounds_the_wait_for_a_worker():
+    engine = FetchEngine(max_concurrency=1, retries=0, timeout=1.0, queue_timeout=0.05)
+    calls = []
+    with engine:
+        engine.run({"first": lambda: time.sleep(0.2), "queued": lambda: calls.append("queued")})
+        time.sleep(0.3)
+    assert isinstance(engine.errors["queued"], asyncio.TimeoutError)
+    # Taken out of the queue, it never ran
+    assert calls == []
+
+
+def test_errors_are_reset_on_every_run():
+    engine, _ = engine_with(failures=1)
+    with engine:
+        engine.quotes(["A"])
+        assert "A" in engine.errors
+        assert engine.quotes(["A"]) == {"A": 1.0}
+    assert engine.errors == {}
+
+
+@pytest.mark.parametrize("retries", [0, 3])
+def test_retries_are_bounded(retries):
+    engine, calls = engine_with(retries=retries, failures=100)
+    with engine:
+        engine.quotes(["A"])
+    assert calls["A"] == retries + 1
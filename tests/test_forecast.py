@@ -0,0 +1,74 @@
+import numpy as np
+
+from forecast import WindowRing, forecast, grouped_predict
+
+
+def fake_predict(X):
+    """Deterministic stand-in for a model: a weighted sum of the window, one value per scenario"""
+    weights = np.linspace(0.1, 1.0, X.shape[1] * X.shape[2], dtype=np.float32)
+    return (X.reshape(len(X), -1) * weights).sum(axis=1) / weights.sum()
+
+
+def naive_forecast(predict, windows, horizon, target_cols):
+    """The loop forecast() replaces: copy the window, drop its first row, append the prediction"""
+    windows = np.array(windows, dtype=np.float32)
+    target_cols = np.broadcast_to(target_cols, (len(windows),))
+    paths = []
+    for _ in range(horizon):
+        predicted = np.asarray(predict(windows), dtype=np.float32)
+        next_rows = windows[:, -1].copy()
+        next_rows[np.arange(len(windows)), target_cols] = predicted
+        windows = np.concatenate([windows[:, 1:], next_rows[:, None]], axis=1)
+        paths.append(predicted)
+    return np.stack(paths, axis=1)
+
+
+def random_windows(n_scenarios=3, steps=4, n_features=2):
+    return np.random.default_rng(0).random((n_scenarios, steps, n_features), dtype=np.float32)
+
+
+def test_window_ring_keeps_the_last_rows_in_order():
+    windows = random_windows()
+    ring = WindowRing(windows)
+    expected = windows.copy()
+    # More pushes than the ring holds, so the head wraps around twice
+    for step in range(2 * ring.steps + 1):
+        rows = np.full((ring.n_scenarios, ring.n_features), step, dtype=np.float32)
+        ring.push(rows)
+        expected = np.concatenate([expected[:, 1:], rows[:, None]], axis=1)
+        np.testing.assert_array_equal(ring.window(), expected)
+        np.testing.assert_array_equal(ring.last(), rows)
+
+
+def test_forecast_matches_a_naive_recursive_loop():
+    windows = random_windows()
+    target_cols = np.array([0, 1, 0])
+    horizon = 3 * windows.shape[1] + 2
+    paths = forecast(fake_predict, windows, horizon, target_cols)
+    assert paths.shape == (3, horizon)
+    np.testing.assert_allclose(paths, naive_forecast(fake_predict, windows, horizon, target_cols), rtol=1e-6)
+
+
+class ScaledModel:
+    """Keras style model with two outputs: the fake prediction times 1 and times `scale`"""
+    def __init__(self, scale):
+        self.scale = scale
+        self.calls = 0
+
+    def predict_on_batch(self, X):
+        self.calls += 1
+        predicted = fake_predict(X)
+        return np.stack([predicted, predicted * self.scale], axis=1)
+
+
+def test_grouped_predict_calls_every_model_once_per_step():
+    models = [ScaledModel(2.0), ScaledModel(0.5)]
+    model_ids, outputs = np.array([0, 1, 0]), np.array([1, 1, 0])
+    windows = random_windows()
+    paths = forecast(grouped_predict(models, model_ids, outputs), windows, 5, 0)
+
+    def one_by_one(X):
+        return np.array([models[i].predict_on_batch(x[None])[0, o] for i, o, x in zip(model_ids, outputs, X)])
+    expected = naive_forecast(one_by_one, windows, 5, 0)
+    np.testing.assert_allclose(paths, expected, rtol=1e-6)
+    assert models[0].calls == 5 + 5 * 2 and models[1].calls == 5 + 5
@@ -0,0 +1,101 @@
+import threading
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+import numpy as np
+import pytest
+
+from inference_service import BatchPredictor
+
+
+class SumModel:
+    """Predicts the sum of every window, counts its predict_on_batch calls"""
+    def __init__(self, scale=1.0, block=None):
+        self.scale = scale
+        self.block = block
+        self.calls = 0
+
+    def predict_on_batch(self, X):
+        if self.block is not None:
+            self.block.wait()
+        self.calls += 1
+        return X.sum(axis=(1, 2))[:, None] * self.scale
+
+
+@pytest.fixture
+def predictor():
+    predictor = BatchPredictor(max_wait=0.05, max_models=2)
+    yield predictor
+    predictor.close()
+
+
+def windows(n, value):
+    return np.full((n, 3, 2), value, dtype=np.float32)
+
+
+def test_requests_are_batched_and_split_per_caller(predictor):
+    model = SumModel()
+    predictor.add_model("m", model)
+    results = predictor.predict_many({"m": windows(2, 1.0)})
+    assert results["m"].ravel().tolist() == [6.0, 6.0]
+
+    futures = [predictor.submit("m", windows(i + 1, i)) for i in range(4)]
+    for i, future in enumerate(futures):
+        assert future.result(timeout=5).ravel().tolist() == [6.0 * i] * (i + 1)
+    assert model.calls <= 3
+    assert predictor.stats()["samples"] == 12
+
+
+def test_errors_reach_every_caller(predictor):
+    class Broken:
+        def predict_on_batch(self, X):
+            raise ValueError("broken")
+
+    predictor.add_model("broken", Broken())
+    with pytest.raises(ValueError, match="broken"):
+        predictor.predict("broken", windows(1, 1.0), timeout=5)
+    with pytest.raises(KeyError):
+        predictor.predict("unknown", windows(1, 1.0), timeout=5)
+
+
+def test_least_recently_used_model_is_evicted(predictor):
+    for name in ("a", "b"):
+        predictor.add_model(name, SumModel())
+    predictor.predict("a", windows(1, 1.0), timeout=5)
+    predictor.add_model("c", SumModel())
+    assert list(predictor.models) == ["a", "c"]
+    with pytest.raises(KeyError):
+        predictor.predict("b", windows(1, 1.0), timeout=5)
+
+
+def test_result_times_out_on_a_stuck_model(predictor):
+    release = threading.Event()
+    predictor.add_model("stuck", SumModel(block=release))
+    future = predictor.submit("stuck", windows(1, 1.0))
+    with pytest.raises(FuturesTimeoutError):
+        future.result(timeout=0.1)
+    release.set()
+    assert future.result(timeout=5).ravel().tolist() == [6.0]
+
+
+def test_requests_with_their_model_survive_eviction(predictor):
+    model = SumModel(scale=2.0)
+    predictor.add_model("a", model)
+    for name in ("b", "c"):
+        predictor.add_model(name, SumModel())
+    assert "a" not in predictor.models
+    assert predictor.predict("a", windows(1, 1.0), timeout=5, model=model).ravel().tolist() == [12.0]
+    assert model.calls == 1
+    # A newer model sent under the same name answers its own requests
+    other = SumModel(scale=3.0)
+    futures = [predictor.submit("a", windows(1, 1.0), model=m) for m in (model, other)]
+    assert [future.result(timeout=5).ravel().tolist() for future in futures] == [[12.0], [18.0]]
+
+
+def test_forecast_feeds_predictions_back(predictor):
+    model = SumModel(scale=0.1)
+    predictor.add_model("m", model)
+    paths = predictor.forecast("m", windows(2, 1.0), horizon=3, target_cols=0, timeout=5)
+    assert paths.shape == (2, 3)
+    # Window sums: 6 -> 0.6, then the first row (1, 1) drops and (0.6, 1) comes in
+    np.testing.assert_allclose(paths[0], [0.6, 0.56, 0.516], rtol=1e-5)
+    assert model.calls == 3
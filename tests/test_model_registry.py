@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+keras = pytest.importorskip("tensorflow").keras
+
+from model_registry import KEEP_VERSIONS, ModelRegistry
+
+
+def tiny_model():
+    model = keras.Sequential([keras.Input((2,)), keras.layers.Dense(1)])
+    model.compile(optimizer="adam", loss="mean_squared_error")
+    return model
+
+
+def versions(registry, key, fingerprint):
+    return sorted(v for v in os.listdir(registry.entry_dir(key, fingerprint))
+                  if not v.startswith(".") and v != "current")
+
+
+def test_loaded_models_are_bounded(tmp_path):
+    registry = ModelRegistry(root=str(tmp_path), max_loaded=2)
+    model = tiny_model()
+    for fingerprint in ["a", "b", "c"]:
+        registry.save("key", fingerprint, model, {"fp": fingerprint})
+    assert list(registry._loaded) == [("key", "b"), ("key", "c")]
+    # Dropped from memory, still on disk
+    assert registry.load("key", "a")[1] == {"fp": "a"}
+    assert list(registry._loaded) == [("key", "c"), ("key", "a")]
+
+
+def test_saving_again_swaps_to_a_new_version(tmp_path):
+    registry = ModelRegistry(root=str(tmp_path))
+    model = tiny_model()
+    registry.save("key", "fp", model, {"run": 1})
+    first = registry.current("key", "fp")
+    registry.save("key", "fp", model, {"run": 2})
+    # The previous version stays readable for a reader that already picked it
+    assert os.path.exists(os.path.join(first, "state.pkl"))
+    assert registry.current("key", "fp") != first
+    assert ModelRegistry(root=str(tmp_path)).load("key", "fp")[1] == {"run": 2}
+
+    for run in range(3, 6):
+        registry.save("key", "fp", model, {"run": run})
+    assert len(versions(registry, "key", "fp")) == KEEP_VERSIONS
+    assert os.path.basename(registry.current("key", "fp")) in versions(registry, "key", "fp")
+    assert registry.latest("key") == "fp"
+
+
+def test_unsaved_entries_load_as_none(tmp_path):
+    assert ModelRegistry(root=str(tmp_path)).load("key", "fp") is None
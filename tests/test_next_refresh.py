@@ -0,0 +1,20 @@
+import pandas as pd
+
+from yfinanceScraper import MARKET_TZ, next_refresh
+
+
+def test_naive_times_are_market_time():
+    naive = pd.Timestamp("2024-03-05 10:00")
+    assert next_refresh(naive) == next_refresh(naive.tz_localize(MARKET_TZ))
+
+
+def test_refresh_is_never_after_the_next_close():
+    # Friday after the close: the next bar comes Monday, the local midnight is earlier
+    now = pd.Timestamp("2024-03-08 17:00", tz=MARKET_TZ)
+    refresh = next_refresh(now)
+    assert now < refresh <= pd.Timestamp("2024-03-11 16:00", tz=MARKET_TZ)
+
+
+def test_aware_times_in_other_zones_are_converted():
+    now = pd.Timestamp("2024-03-05 15:00", tz="UTC")
+    assert next_refresh(now) == next_refresh(now.tz_convert(MARKET_TZ))
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+keras = pytest.importorskip("tensorflow").keras
+
+from feature_pipeline import FeaturePipeline
+from model_registry import ModelRegistry
+from retrain import FINE_TUNE_LR_SCALE, fine_tune, incremental_retrain
+
+STEPS = 5
+
+
+def frame(n_rows):
+    index = pd.bdate_range("2024-01-01", periods=n_rows)
+    values = np.sin(np.arange(n_rows) / 5.0)[:, None] * [1.0, 2.0] + [10.0, 20.0]
+    return pd.DataFrame(values, index=index, columns=["a.close", "b.close"])
+
+
+def trainer(data):
+    def train():
+        pipeline = FeaturePipeline("a.close", steps=STEPS).fit(data)
+        X, y = pipeline.training_windows(data)
+        model = keras.Sequential([keras.Input(X.shape[1:]), keras.layers.LSTM(4), keras.layers.Dense(1)])
+        model.compile(optimizer="adam", loss="mean_squared_error")
+        model.fit(X, y, epochs=1, verbose=0)
+        return model, {"pipeline": pipeline}
+    return train
+
+
+def test_models_from_get_or_train_are_fine_tuned_on_new_rows(tmp_path):
+    registry = ModelRegistry(root=str(tmp_path))
+    old = frame(60)
+    _, state, hit = registry.get_or_train("key", old, trainer(old))
+    assert not hit and state["last_index"] == old.index[-1]
+
+    new = frame(65)
+    _, state, mode = incremental_retrain(registry, "key", new, trainer(new), epochs=1)
+    assert mode == "fine_tuned"
+    assert state["last_index"] == new.index[-1]
+
+    assert incremental_retrain(registry, "key", new, trainer(new))[2] == "cached"
+    # A fresh registry on the same directory reads the same state back from disk
+    _, state, hit = ModelRegistry(root=str(tmp_path)).get_or_train("key", new, trainer(new))
+    assert hit and state["last_index"] == new.index[-1]
+
+
+def test_fine_tune_keeps_the_optimizer_settings_at_a_lower_learning_rate():
+    model = keras.Sequential([keras.Input((2,)), keras.layers.Dense(1)])
+    model.compile(optimizer=keras.optimizers.Adam(learning_rate=0.01, beta_1=0.8, clipnorm=1.0),
+                  loss="mean_squared_error")
+    X, y = np.ones((8, 2)), np.ones((8, 1))
+    model.fit(X, y, epochs=1, verbose=0)
+
+    tuned = fine_tune(model, X, y, epochs=1)
+    config = tuned.optimizer.get_config()
+    assert isinstance(tuned.optimizer, keras.optimizers.Adam)
+    assert config["beta_1"] == pytest.approx(0.8) and config["clipnorm"] == 1.0
+    assert config["learning_rate"] == pytest.approx(0.01 * FINE_TUNE_LR_SCALE)
+    assert fine_tune(model, X, y, epochs=1, learning_rate=1e-4).optimizer.get_config()["learning_rate"] \
+        == pytest.approx(1e-4)
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+import backtest
+import sweep
+
+
+def history(close, start="2020-01-01"):
+    close = np.asarray(close, dtype=np.float64)
+    index = pd.bdate_range(start, periods=len(close))
+    return pd.DataFrame({"open": close, "high": close * 1.01, "low": close * 0.99, "close": close}, index=index)
+
+
+def vix_history(n_bars):
+    rng = np.random.default_rng(1)
+    close = 20 + np.cumsum(rng.normal(0, 1, n_bars))
+    data = history(close)
+    data["open"] = close + rng.normal(0, 0.5, n_bars)
+    return data
+
+
+def test_empty_sweeps_return_an_empty_frame():
+    vix = vix_history(50)
+    for result in (sweep.run_sweep(vix, {}), sweep.run_sweep(vix, {"A": history(np.ones(50))}, lookbacks=[])):
+        assert result.empty
+        assert list(result.columns) == ["ticker", "lookback", "threshold", "holding_period", *backtest.METRICS]
+
+
+def test_no_position_before_a_ticker_is_listed():
+    n_bars = 300
+    rng = np.random.default_rng(2)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n_bars)))
+    vix = vix_history(n_bars)
+    late = history(close[150:], start=vix.index[150])
+    # A ticker listed halfway scores like the full history cut to the same bars
+    result = sweep.run_sweep(vix, {"full": history(close), "late": late}, lookbacks=[10], holding_periods=[3],
+                             max_workers=1).set_index("ticker").loc[["late"]]
+    trigger = backtest.signals.cvr_trigger(vix["open"], vix["high"], vix["low"], vix["close"], lookback=10)
+    _, expected = backtest.simulate(trigger["buy"].to_numpy()[150:], trigger["sell"].to_numpy()[150:],
+                                    close[150:], 3)
+    for key in ("exposure", "turnover", "trades", "sharpe"):
+        assert np.isclose(result[key].iloc[0], expected[key], equal_nan=True), key